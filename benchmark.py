@@ -0,0 +1,534 @@
+"""
+Pruebas de rendimiento de los componentes del bot
+Uso: python benchmark.py [busqueda] [semantica] [arranque] [cache] [llm] [extremo] [historial]
+     [historiales] [prompt] [intenciones] [clasificador] [ingesta] [extraccion]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+import bot
+from bot import JCE_DOCUMENTS, JCE_RESOLUTIONS, PASAJES, RETRIEVER
+from conversation_store import ConversationStore
+from history_backends import MemoryHistory, RedisHistory, SQLiteHistory
+from extraction import PALABRAS_CLAVE, informacion_documento, informacion_resolucion
+from prompt_builder import estimar_tokens
+from knowledge_snapshot import KnowledgeSnapshot
+from llm_providers import StubProvider, create_provider
+from process_all_documents import DocumentProcessor
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+from retrieval import build_retriever
+from semantic_cache import SemanticCache
+from semantic_search import SemanticIndex
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+CONSULTAS = [
+    "requisitos acta de nacimiento",
+    "cuánto cuesta la cédula",
+    "residencia de extranjeros en el país",
+    "renumeración de actas y folios",
+    "notas digitales en las actas",
+    "validación de actas del estado civil",
+    "mi hijo nació fuera y quiero declararlo",
+    "corrección de datos en el acta",
+]
+
+# Preguntas frecuentes con otras palabras (la última niega lo contrario que la FAQ)
+PREGUNTAS_FRECUENTES = [
+    "cuanto tarda un cambio de nombre",
+    "puedo renovar la cedula antes de que se venza",
+    "perdí mi acta de nacimiento, qué hago",
+    "qué documentos necesito para casarme con un extranjero",
+    "¿Puedo obtener un acta de nacimiento si tengo cédula?",
+]
+
+# Consultas que el clasificador debe dejar a Gemini: preguntan por el contenido de los
+# documentos (no hay respuesta predefinida) o niegan lo que pregunta la FAQ
+PARA_GEMINI = {
+    "residencia de extranjeros en el país",
+    "renumeración de actas y folios",
+    "notas digitales en las actas",
+    "validación de actas del estado civil",
+    "¿Puedo obtener un acta de nacimiento si tengo cédula?",
+}
+
+
+def ampliar_corpus(documentos, factor):
+    """Replicar un corpus para simular uno `factor` veces más grande"""
+    return {
+        f"{doc_id}#{copia}": documento
+        for copia in range(factor)
+        for doc_id, documento in documentos.items()
+    }
+
+
+def medir(funcion, argumentos, repeticiones):
+    """Ejecutar una función varias veces y devolver las duraciones en microsegundos"""
+    duraciones = []
+    for _ in range(repeticiones):
+        for argumento in argumentos:
+            inicio = time.perf_counter()
+            funcion(argumento)
+            duraciones.append((time.perf_counter() - inicio) * 1e6)
+    return duraciones
+
+
+def reportar(nombre, duraciones):
+    """Imprimir media, mediana y p95 de una serie de duraciones"""
+    ordenadas = sorted(duraciones)
+    p95 = ordenadas[int(len(ordenadas) * 0.95) - 1]
+    print(f"   {nombre}: media {statistics.mean(duraciones):.1f} µs, "
+          f"mediana {statistics.median(duraciones):.1f} µs, p95 {p95:.1f} µs")
+
+
+def benchmark_busqueda(repeticiones):
+    """Latencia de consultas BM25 sobre el corpus actual y uno 100 veces mayor"""
+    print("🔎 Búsqueda BM25")
+    for factor in (1, 100):
+        inicio = time.perf_counter()
+        retriever = build_retriever(
+            ampliar_corpus(JCE_DOCUMENTS, factor),
+            ampliar_corpus(JCE_RESOLUTIONS, factor)
+        )
+        construccion = time.perf_counter() - inicio
+        print(f"   Corpus x{factor}: {len(retriever)} unidades, índice construido en {construccion:.2f} s")
+        reportar(f"consulta x{factor}", medir(retriever.buscar, CONSULTAS, repeticiones))
+
+
+def benchmark_semantica(repeticiones):
+    """Latencia y memoria de la búsqueda semántica con la matriz mapeada desde disco"""
+    print("🧭 Búsqueda semántica")
+    inicio = time.perf_counter()
+    index = SemanticIndex.build(PASAJES)
+    print(f"   {len(index)} pasajes vectorizados en {time.perf_counter() - inicio:.2f} s")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for factor in (1, 100):
+            archivo = Path(directorio) / f"embeddings_x{factor}.npy"
+            np.save(archivo, np.tile(index.matriz, (factor, 1)))
+            mapeado = SemanticIndex(np.load(archivo, mmap_mode='r'), index.embedder)
+
+            duraciones = medir(mapeado.buscar, CONSULTAS, repeticiones)
+
+            # La memoria se mide en una pasada aparte porque tracemalloc altera los tiempos
+            tracemalloc.start()
+            medir(mapeado.buscar, CONSULTAS, 1)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"   Corpus x{factor}: matriz {mapeado.matriz.nbytes / 1e6:.1f} MB en disco (mapeada), "
+                  f"pico por consulta {pico / 1e3:.0f} KB")
+            reportar(f"consulta x{factor}", duraciones)
+
+    print(f"   Memoria residente máxima del proceso: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3:.0f} MB")
+
+
+def medir_carga(funcion):
+    """Duración en segundos y memoria Python retenida en MB de una función de carga"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion()
+    duracion = time.perf_counter() - inicio
+    retenida, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+    return duracion, retenida / 1e6
+
+
+def benchmark_arranque(repeticiones):
+    """Tiempo y memoria de carga de la base de conocimiento: JSON + índice contra snapshot"""
+    print("📦 Carga de la base de conocimiento")
+    with tempfile.TemporaryDirectory() as directorio:
+        for factor in (1, 20):
+            documentos = ampliar_corpus({k: dict(v) for k, v in JCE_DOCUMENTS.items()}, factor)
+            resoluciones = ampliar_corpus({k: dict(v) for k, v in JCE_RESOLUTIONS.items()}, factor)
+
+            archivo_json = Path(directorio) / f"documentos_x{factor}.json"
+            with open(archivo_json, 'w', encoding='utf-8') as f:
+                json.dump({"documentos": documentos, "resoluciones": resoluciones}, f, ensure_ascii=False)
+            archivo_snapshot = Path(directorio) / f"conocimiento_x{factor}.snap"
+            KnowledgeSnapshot.write(documentos, resoluciones, archivo_snapshot, fuentes={})
+
+            def cargar_json():
+                with open(archivo_json, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return data, build_retriever(data["documentos"], data["resoluciones"])
+
+            json_tiempo, json_memoria = medir_carga(cargar_json)
+            snap_tiempo, snap_memoria = medir_carga(lambda: KnowledgeSnapshot.load(archivo_snapshot))
+            print(f"   Corpus x{factor}: JSON {json_tiempo:.2f} s / {json_memoria:.1f} MB, "
+                  f"snapshot {snap_tiempo:.3f} s / {snap_memoria:.1f} MB")
+
+
+def benchmark_cache(repeticiones):
+    """Búsqueda en la caché por similitud con 100.000 preguntas guardadas"""
+    print("🧠 Caché por similitud")
+    generador = random.Random(42)
+    frecuencias = RETRIEVER.frecuencias()
+    vocabulario = sorted(frecuencias)
+
+    cache = SemanticCache(frecuencias=frecuencias, max_entries=100000)
+    preguntas = []
+    inicio = time.perf_counter()
+    while len(cache) < 100000:
+        pregunta = " ".join(generador.sample(vocabulario, generador.randint(2, 6)))
+        cache.set(pregunta, pregunta)
+        preguntas.append(pregunta)
+    print(f"   {len(cache)} entradas cargadas en {time.perf_counter() - inicio:.2f} s")
+
+    # Paráfrasis de preguntas guardadas (otro orden y fórmulas de consulta) y preguntas nuevas
+    parafrasis = []
+    for pregunta in generador.sample(preguntas, 200):
+        palabras = pregunta.split()
+        generador.shuffle(palabras)
+        parafrasis.append("que necesito para " + " ".join(palabras))
+    nuevas = [" ".join(generador.sample(vocabulario, 4)) for _ in range(200)]
+
+    reportar("paráfrasis", medir(cache.get, parafrasis, max(1, repeticiones // 10)))
+    reportar("preguntas nuevas", medir(cache.get, nuevas, max(1, repeticiones // 10)))
+    print(f"   Aciertos: {cache.stats()['tasa_aciertos']:.0%}")
+
+
+class ModeloSimulado:
+    """Modelo local que responde tras `latencia` segundos, con la interfaz síncrona y asíncrona de Gemini"""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+
+    def generate_content(self, prompt):
+        time.sleep(self.latencia)
+        return SimpleNamespace(text=f"Respuesta a: {prompt[:20]}")
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latencia)
+        return SimpleNamespace(text=f"Respuesta a: {prompt[:20]}")
+
+
+async def carga_llm(llamar, concurrencia, total):
+    """Lanzar `total` llamadas con a lo sumo `concurrencia` en curso; devuelve duración e hilos máximos"""
+    semaforo = asyncio.Semaphore(concurrencia)
+    hilos = threading.active_count()
+
+    async def una(i):
+        nonlocal hilos
+        async with semaforo:
+            await llamar(f"consulta {i}")
+            hilos = max(hilos, threading.active_count())
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(i) for i in range(total)))
+    return time.perf_counter() - inicio, hilos
+
+
+def benchmark_llm(repeticiones):
+    """Llamadas concurrentes a un modelo simulado: asyncio.to_thread contra el cliente asíncrono"""
+    print("🤖 Llamadas al modelo (latencia simulada de 200 ms)")
+    modelo = ModeloSimulado(0.2)
+    caminos = {
+        "hilos": lambda prompt: asyncio.to_thread(modelo.generate_content, prompt),
+        "asíncrono": modelo.generate_content_async,
+    }
+    for concurrencia in (16, 64, 256):
+        total = concurrencia * 4
+        for nombre, llamar in caminos.items():
+            tracemalloc.start()
+            # Un loop nuevo por prueba para que cada camino empiece con el ejecutor vacío
+            duracion, hilos = asyncio.run(carga_llm(llamar, concurrencia, total))
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"   Concurrencia {concurrencia}, {nombre}: {total / duracion:.0f} llamadas/s, "
+                  f"{hilos} hilos, pico {pico / 1e3:.0f} KB")
+
+
+class MensajeSimulado:
+    """Mensaje de Telegram mínimo para llamar a message_handler sin conexión"""
+
+    def __init__(self, user_id, texto):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.chat = SimpleNamespace(id=user_id)
+        self.text = texto
+        self.respuestas = []
+
+    async def reply_text(self, texto):
+        self.respuestas.append(texto)
+        return self
+
+    async def edit_text(self, texto):
+        self.respuestas[-1] = texto
+
+
+async def carga_extremo(usuarios, mensajes_por_usuario):
+    """Usuarios concurrentes que envían sus mensajes uno tras otro; devuelve latencias y duración"""
+    # Un semáforo nuevo por prueba: los de asyncio quedan ligados al loop en que se usan
+    bot.GEMINI_SEMAFORO = asyncio.Semaphore(int(os.getenv("GEMINI_CONCURRENCIA", "16")))
+    latencias = []
+
+    async def usuario(user_id):
+        for n in range(mensajes_por_usuario):
+            # Preguntas distintas para que ninguna se responda desde la caché
+            texto = f"{CONSULTAS[n % len(CONSULTAS)]} (consulta {user_id}-{n})"
+            mensaje = MensajeSimulado(user_id, texto)
+            inicio = time.perf_counter()
+            await bot.message_handler(SimpleNamespace(message=mensaje, effective_chat=mensaje.chat), None)
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario(user_id) for user_id in range(usuarios)))
+    return latencias, time.perf_counter() - inicio
+
+
+def benchmark_extremo(repeticiones):
+    """Rendimiento de message_handler de punta a punta con el proveedor configurado (simulado por defecto)"""
+    proveedor = create_provider() if os.getenv("LLM_PROVIDER") else StubProvider(latencia=0.5, tokens_por_segundo=400)
+    print(f"📨 Mensajes de punta a punta ({proveedor.nombre})")
+    bot.LLM = proveedor
+    bot.LIMITADOR = RateLimiter(10**6, 10**6)
+    bot.CACHE_RESPUESTAS = ResponseCache()
+    bot.CACHE_SIMILARES = None
+
+    for usuarios in (1, 16, 64):
+        latencias, duracion = asyncio.run(carga_extremo(usuarios, 4))
+        ordenadas = sorted(latencias)
+        print(f"   {usuarios} usuarios: {len(latencias) / duracion:.1f} mensajes/s, "
+              f"mediana {statistics.median(latencias) * 1000:.0f} ms, "
+              f"p95 {ordenadas[int(len(ordenadas) * 0.95) - 1] * 1000:.0f} ms")
+
+
+def benchmark_historial(repeticiones):
+    """Memoria del historial con cada vez más usuarios distintos y un presupuesto de 16 MB"""
+    print("🗂️ Historial de conversaciones")
+    historial = ConversationStore("sistema", max_bytes=16 * 1024 * 1024)
+    respuesta = "Respuesta de ejemplo con el largo típico de una respuesta de Gemini. " * 20
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    for user_id in range(1, 200001):
+        historial.append(user_id, "user", f"{CONSULTAS[user_id % len(CONSULTAS)]} {user_id}")
+        historial.append(user_id, "assistant", respuesta + str(user_id))
+        if user_id % 50000 == 0:
+            actual, _ = tracemalloc.get_traced_memory()
+            print(f"   {user_id} usuarios: {len(historial)} conversaciones, "
+                  f"{historial.tamano / 1e6:.1f} MB estimados, {actual / 1e6:.1f} MB medidos")
+    tracemalloc.stop()
+    print(f"   {400000 / (time.perf_counter() - inicio):.0f} turnos/s, {historial.stats()['desalojadas']} desalojadas")
+
+
+async def carga_historial(historial, usuarios, turnos_por_usuario):
+    """Conversaciones concurrentes: cada turno escribe la consulta, lee el historial y escribe la
+    respuesta; al final se compacta y se devuelve lo leído de cada usuario"""
+    async def conversacion(user_id):
+        for n in range(turnos_por_usuario):
+            await historial.append(user_id, "user", f"{CONSULTAS[n % len(CONSULTAS)]} {user_id}")
+            await historial.turnos(user_id)
+            await historial.append(user_id, "assistant", f"Respuesta {n} para el usuario {user_id}")
+        await historial.compactar(user_id, f"Resumen de la conversación de {user_id}", 4)
+        return [(turno.role, turno.content) for turno in await historial.turnos(user_id)]
+
+    return await asyncio.gather(*(conversacion(user_id) for user_id in range(1, usuarios + 1)))
+
+
+def benchmark_historiales(repeticiones):
+    """La misma carga en cada backend del historial; redis se prueba con fakeredis, sin servidor"""
+    print("🗄️ Backends del historial")
+    usuarios, turnos_por_usuario = 100, 10
+    with tempfile.TemporaryDirectory() as directorio:
+        backends = {
+            "memoria": lambda: MemoryHistory(ConversationStore("sistema")),
+            "sqlite": lambda: SQLiteHistory("sistema", os.path.join(directorio, "historial.db")),
+        }
+        if FAKEREDIS_AVAILABLE:
+            backends["redis"] = lambda: RedisHistory("sistema", cliente=fakeredis.FakeAsyncRedis())
+        else:
+            print("   fakeredis no está instalado (pip install fakeredis): se omite redis")
+
+        async def ejecutar(crear):
+            historial = crear()
+            try:
+                inicio = time.perf_counter()
+                leidos = await carga_historial(historial, usuarios, turnos_por_usuario)
+                return leidos, time.perf_counter() - inicio
+            finally:
+                await historial.close()
+
+        resultados = {}
+        for nombre, crear in backends.items():
+            resultados[nombre], duracion = asyncio.run(ejecutar(crear))
+            print(f"   {nombre}: {usuarios * turnos_por_usuario * 3 / duracion:.0f} operaciones/s")
+
+    mismos = all(leidos == resultados["memoria"] for leidos in resultados.values())
+    print(f"   mismos turnos y resúmenes en todos: {'sí' if mismos else 'no'}")
+
+
+def benchmark_prompt(repeticiones):
+    """Armado del prompt para una conversación con 20 respuestas largas de Gemini"""
+    print("🧾 Armado del prompt")
+    historial = ConversationStore(bot.HISTORIAL_SISTEMA)
+    respuesta = "Respuesta detallada sobre requisitos y procedimientos del registro civil. " * 30
+    for n in range(10):
+        historial.append(1, "user", CONSULTAS[n % len(CONSULTAS)])
+        historial.append(1, "assistant", respuesta)
+    historial.append(1, "user", CONSULTAS[0])
+    turnos = historial.turnos(1)
+    pasajes = PASAJES.buscar(CONSULTAS[0], k=bot.PASAJES_POR_CONSULTA)
+
+    def armar(_):
+        contexto, _ = bot.construir_contexto(pasajes, bot.PROMPT.presupuesto_pasajes(turnos))
+        return bot.PROMPT.construir(turnos, contexto)
+
+    completo = sum(turno.tokens for turno in turnos) + estimar_tokens(bot.construir_contexto(pasajes)[0])
+    print(f"   Conversación completa: {completo} tokens estimados, "
+          f"prompt armado: {estimar_tokens(armar(None))} tokens (presupuesto {bot.PROMPT.max_tokens})")
+    reportar("armado", medir(armar, [None], repeticiones * 10))
+
+
+def benchmark_intenciones(repeticiones):
+    """Clasificación de intenciones de las respuestas predefinidas"""
+    print("🧭 Intenciones de las respuestas predefinidas")
+    for consulta in CONSULTAS[:4]:
+        print(f"   {consulta!r} -> {bot.ROUTER.clasificar(consulta)[0]}")
+    reportar("clasificación", medir(bot.ROUTER.clasificar, CONSULTAS, repeticiones * 10))
+
+
+def benchmark_clasificador(repeticiones):
+    """Clasificador local de consultas frecuentes frente a la búsqueda de pasajes"""
+    print(f"🏷️ Clasificador local ({len(bot.CLASIFICADOR)} clases)")
+    directas = errores = 0
+    consultas = CONSULTAS + PREGUNTAS_FRECUENTES
+    for consulta in consultas:
+        clase, confianza = bot.CLASIFICADOR.clasificar(consulta)
+        directas += clase != bot.CLASE_LLM
+        acierto = (clase == bot.CLASE_LLM) == (consulta in PARA_GEMINI)
+        errores += not acierto
+        print(f"   {'✅' if acierto else '⚠️'} {consulta!r} -> {clase} ({confianza:.2f})")
+    print(f"   respuestas sin Gemini: {directas}/{len(consultas)} "
+          f"(esperadas {len(consultas) - len(PARA_GEMINI)}, {errores} mal clasificadas)")
+    reportar("clasificación", medir(bot.CLASIFICADOR.clasificar, consultas, repeticiones))
+    reportar("búsqueda de pasajes", medir(bot.buscar_pasajes, CONSULTAS, repeticiones))
+
+
+def benchmark_ingesta(repeticiones):
+    """Extracción de los PDF de documentos_jce: secuencial contra un proceso por núcleo"""
+    print("📄 Ingesta de los PDF de documentos_jce")
+    for jobs in sorted({1, os.cpu_count() or 1}):
+        procesador = DocumentProcessor(cargar=False)
+        inicio = time.perf_counter()
+        procesados = procesador.process_all_documents("documentos_jce", jobs, incremental=False)
+        print(f"   {jobs} proceso(s): {procesados} documentos en {time.perf_counter() - inicio:.2f} s")
+
+
+def primero_por_campo(patrones, texto, flags=0):
+    """Primer grupo del primer patrón que coincide, buscando con cada patrón por separado"""
+    for patron in patrones:
+        match = re.search(patron, texto, flags)
+        if match:
+            return match.group(1)
+    return None
+
+
+def extraer_por_campo(texto, titulo, resolucion):
+    """Extracción anterior a extraction.py: una búsqueda por patrón y por campo"""
+    numeros = ([r'Resolución\s+No\.?\s*(\d+)', r'Resolución\s+(\d+)', r'No\.?\s*(\d+)', r'Res\.\s*(\d+)']
+               if resolucion else [r'No\.?\s*(\d+)', r'Número\s*(\d+)', r'(\d+)-(\d{4})', r'Res\.\s*(\d+)'])
+    fechas = [r'(\d{1,2}/\d{1,2}/\d{4})', r'(\d{1,2}-\d{1,2}-\d{4})', r'(\d{1,2}\s+de\s+\w+\s+de\s+\d{4})']
+
+    def numerados(patron, clave):
+        return [{clave: numero, "contenido": contenido.strip()}
+                for numero, contenido in re.findall(patron, texto, re.IGNORECASE)]
+
+    contactos = ([{"tipo": "telefono", "valor": v} for v in re.findall(r'\(\d{3}\)\s*\d{3}-\d{4}', texto)]
+                 + [{"tipo": "email", "valor": v}
+                    for v in re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', texto)])
+    info = {
+        "titulo": titulo,
+        "numero_resolucion" if resolucion else "numero": primero_por_campo(numeros, texto, re.IGNORECASE) or "No especificado",
+        "fecha": primero_por_campo(fechas, texto) or "No especificada",
+        "articulos": numerados(r'Artículo\s+(\d+)\.?\s*([^.]*\.)', "numero"),
+    }
+    if resolucion:
+        secciones = ["aplicación", "vigencia", "entrada en vigor", "alcance", "ámbito de aplicación"]
+        info["disposiciones"] = numerados(r'Disposición\s+(\w+)\.?\s*([^.]*\.)', "tipo")
+        info["aplicacion"] = [m for seccion in secciones for m in re.findall(rf'{seccion}[^.]*\.', texto, re.IGNORECASE)]
+        info["sanciones"] = re.findall(r'sanción[^.]*\.', texto, re.IGNORECASE)
+        info["contactos"] = contactos
+    else:
+        info["capitulos"] = numerados(r'Capítulo\s+(\d+)\.?\s*([^.]*\.)', "numero")
+        info["disposiciones"] = numerados(r'Disposición\s+(\w+)\.?\s*([^.]*\.)', "tipo")
+        info["contactos"] = contactos
+        info["palabras_clave"] = [palabra for palabra in PALABRAS_CLAVE if palabra in texto.lower()]
+    return info
+
+
+def benchmark_extraccion(repeticiones):
+    """Extracción de información estructurada: una pasada contra una búsqueda por campo"""
+    textos = [(doc_id, d.get("contenido", "")) for doc_id, d in list(JCE_DOCUMENTS.items()) + list(JCE_RESOLUTIONS.items())]
+    caracteres = sum(len(texto) for _, texto in textos)
+    print(f"🧾 Extracción de información ({len(textos)} textos, {caracteres / 1e3:.0f} mil caracteres)")
+    for resolucion, nueva in ((False, informacion_documento), (True, informacion_resolucion)):
+        iguales = all(nueva(texto, titulo) == extraer_por_campo(texto, titulo, resolucion) for titulo, texto in textos)
+        duraciones = {}
+        for nombre, funcion in (("por campo", lambda t, titulo: extraer_por_campo(t, titulo, resolucion)), ("una pasada", nueva)):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones // 10 or 1):
+                for titulo, texto in textos:
+                    funcion(texto, titulo)
+            duraciones[nombre] = (time.perf_counter() - inicio) / (repeticiones // 10 or 1) * 1000
+        print(f"   {'resoluciones' if resolucion else 'documentos'}: por campo {duraciones['por campo']:.1f} ms, "
+              f"una pasada {duraciones['una pasada']:.1f} ms ({duraciones['por campo'] / duraciones['una pasada']:.1f}x), "
+              f"mismos resultados: {'sí' if iguales else 'NO'}")
+
+
+BENCHMARKS = {
+    "busqueda": benchmark_busqueda,
+    "semantica": benchmark_semantica,
+    "arranque": benchmark_arranque,
+    "cache": benchmark_cache,
+    "llm": benchmark_llm,
+    "extremo": benchmark_extremo,
+    "historial": benchmark_historial,
+    "historiales": benchmark_historiales,
+    "prompt": benchmark_prompt,
+    "intenciones": benchmark_intenciones,
+    "clasificador": benchmark_clasificador,
+    "ingesta": benchmark_ingesta,
+    "extraccion": benchmark_extraccion,
+}
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento del bot")
+    parser.add_argument("pruebas", nargs="*", help=f"Pruebas a ejecutar: {', '.join(BENCHMARKS)} (todas por defecto)")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Repeticiones por consulta")
+    args = parser.parse_args()
+    desconocidas = [nombre for nombre in args.pruebas if nombre not in BENCHMARKS]
+    if desconocidas:
+        parser.error(f"Pruebas desconocidas: {', '.join(desconocidas)}")
+
+    print("⏱️ Pruebas de rendimiento")
+    print("=" * 40)
+    for nombre in args.pruebas or BENCHMARKS:
+        BENCHMARKS[nombre](args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
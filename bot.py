@@ -2,23 +2,48 @@ from telegram.ext import Application, ContextTypes, MessageHandler, filters
 from telegram import Update
 from dotenv import load_dotenv
 import os
-import google.generativeai as genai
 import asyncio
-import time
 import json
+import re
+from retrieval import build_retriever
+from knowledge_snapshot import load_snapshot
+from passages import PASSAGES_FILE, PASSAGES_INDEX_FILE, PassageStore
+from semantic_search import buscar_hibrido, load_semantic_index
+from response_cache import ResponseCache, huella_contexto
+from semantic_cache import SemanticCache
+from rate_limiter import RateLimiter
+from update_processor import ChatOrderedUpdateProcessor
+from webhook import ALLOWED_UPDATES, run_webhook
+from streaming import StreamingReply
+from llm_providers import create_provider
+from history_backends import create_history
+from prompt_builder import PromptBuilder, estimar_tokens
+from summarizer import Summarizer
+from intent_router import IntentRouter
+from intent_classifier import LLM as CLASE_LLM, IntentClassifier, ejemplos_de_entrenamiento, registrar_consulta
 
 # Cargar variables de entorno
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
-# Configurar Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+# URL de la API de Telegram (se puede apuntar a fake_telegram.py para pruebas locales)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Modo webhook: si hay WEBHOOK_URL se atiende por HTTP en lugar de long polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+
+# Modelo de lenguaje: Gemini o el modelo simulado para pruebas (LLM_PROVIDER)
+LLM = create_provider()
+
+# Snapshot compilado de la base de conocimiento (None si no existe o está desactualizado)
+SNAPSHOT = load_snapshot()
 
 # Cargar resoluciones JCE
 def load_jce_resolutions():
     """Cargar resoluciones oficiales de la JCE"""
+    if SNAPSHOT is not None:
+        return SNAPSHOT.resoluciones
+
     resolutions = {}
     try:
         if os.path.exists("jce_resolutions.json"):
@@ -38,6 +63,9 @@ JCE_RESOLUTIONS = load_jce_resolutions()
 # Cargar documentos oficiales JCE
 def load_jce_documents():
     """Cargar documentos oficiales de la JCE"""
+    if SNAPSHOT is not None:
+        return SNAPSHOT.documentos
+
     documents = {}
     try:
         if os.path.exists("jce_documents.json"):
@@ -54,8 +82,75 @@ def load_jce_documents():
 # Cargar documentos al inicio
 JCE_DOCUMENTS = load_jce_documents()
 
-# Diccionario para mantener historial por usuario
-mensajes = {}
+# Índice BM25 construido una sola vez para no recorrer el texto completo en cada mensaje
+RETRIEVER = SNAPSHOT.retriever if SNAPSHOT is not None else build_retriever(JCE_DOCUMENTS, JCE_RESOLUTIONS)
+
+# Cantidad de resultados que se consideran por consulta
+RESULTADOS_POR_CONSULTA = 5
+
+# Cargar pasajes para el prompt (generados con passages.py, o construidos desde los JSON)
+def load_passage_store():
+    """Cargar el almacén de pasajes de los documentos JCE"""
+    try:
+        if os.path.exists(PASSAGES_FILE) and os.path.exists(PASSAGES_INDEX_FILE):
+            return PassageStore.load()
+    except Exception as e:
+        print(f"Error cargando pasajes: {e}")
+    return PassageStore.from_documents(JCE_DOCUMENTS, JCE_RESOLUTIONS)
+
+PASAJES = load_passage_store()
+PASAJES.indexar()
+
+# Cantidad de pasajes que se incluyen en el prompt
+PASAJES_POR_CONSULTA = int(os.getenv("PASAJES_POR_CONSULTA", "4"))
+
+# Citas de los pasajes en las respuestas de Gemini: [1], [2]...
+CITA = re.compile(r"\[(\d+)\]")
+# Citas con el espacio que las precede, para quitarlas del historial
+CITA_EN_TEXTO = re.compile(r"[ \t]*\[\d+\]")
+# Separa la respuesta de la lista de fuentes que se agrega al final
+FUENTES = "\n\n📚 Fuentes:\n"
+
+# Búsqueda de pasajes: "bm25" (por defecto), "semantica" o "hibrida"
+BUSQUEDA = os.getenv("BUSQUEDA", "bm25").lower()
+INDICE_SEMANTICO = load_semantic_index(PASAJES) if BUSQUEDA in ("semantica", "hibrida") else None
+
+def buscar_pasajes(texto, k=PASAJES_POR_CONSULTA):
+    """Buscar los pasajes más relevantes con el motor configurado"""
+    if INDICE_SEMANTICO is None:
+        return PASAJES.buscar(texto, k=k)
+    if BUSQUEDA == "semantica":
+        return [PASAJES.resultado(posicion, puntaje) for posicion, puntaje in INDICE_SEMANTICO.buscar(texto, k=k)]
+    return buscar_hibrido(PASAJES, INDICE_SEMANTICO, texto, k=k)
+
+# Caché de respuestas de Gemini (CACHE_DB activa el nivel en disco)
+CACHE_RESPUESTAS = ResponseCache(
+    ttl=int(os.getenv("CACHE_TTL", "86400")),
+    max_entries=int(os.getenv("CACHE_MAX_ENTRADAS", "1000")),
+    db_path=os.getenv("CACHE_DB") or None
+)
+
+# Caché por similitud para preguntas parafraseadas (desactivada salvo que se defina CACHE_SIMILITUD)
+UMBRAL_SIMILITUD = float(os.getenv("CACHE_SIMILITUD", "0"))
+CACHE_SIMILARES = SemanticCache(
+    umbral=UMBRAL_SIMILITUD,
+    ttl=int(os.getenv("CACHE_TTL", "86400")),
+    frecuencias=RETRIEVER.frecuencias()
+) if UMBRAL_SIMILITUD > 0 else None
+
+# Historial por usuario: últimos turnos, con vencimiento por inactividad
+# (en memoria, o compartido entre procesos con HISTORIAL_BACKEND=sqlite o redis)
+HISTORIAL_SISTEMA = (
+    "Eres un asistente virtual especializado en Registro Civil de República Dominicana. "
+    "Responde a los gestores usando resoluciones y reglas oficiales de la Junta Central Electoral."
+)
+HISTORIAL = create_history(HISTORIAL_SISTEMA)
+
+# Presupuesto de tokens del prompt y parte reservada para los pasajes oficiales
+PROMPT = PromptBuilder(
+    max_tokens=int(os.getenv("PROMPT_MAX_TOKENS", "4000")),
+    reserva_pasajes=int(os.getenv("PROMPT_RESERVA_PASAJES", "1500"))
+)
 
 # Respuestas predefinidas para cuando Gemini no esté disponible
 RESPUESTAS_PREDEFINIDAS = {
@@ -325,189 +420,277 @@ Sábados: 8:00 AM - 12:00 PM
 • San Juan de la Maguana"""
 }
 
-# Control de límites
-ultima_llamada = 0
-llamadas_por_minuto = 0
+# Control de límites: cuota global de Gemini y límite por usuario (llamadas por minuto)
+LIMITADOR = RateLimiter(
+    por_minuto=int(os.getenv("GEMINI_RPM", "15")),
+    por_minuto_usuario=int(os.getenv("USUARIO_RPM", "5"))
+)
+
+# Segundos que una consulta puede esperar turno antes de usar la respuesta predefinida
+ESPERA_MAXIMA = float(os.getenv("ESPERA_MAXIMA", "10"))
+
+# Mensajes que se procesan a la vez (los de un mismo chat siempre en orden)
+CONCURRENCIA = int(os.getenv("CONCURRENCIA", "64"))
+# Updates recibidos sin terminar (en proceso o esperando el turno de su chat): al llegar al
+# máximo se deja de leer la cola de updates, que también es acotada, y Telegram retiene el resto
+PENDIENTES_MAX = int(os.getenv("PENDIENTES_MAX", str(4 * CONCURRENCIA)))
+
+# Llamadas simultáneas a Gemini; el resto espera aquí hasta que se libere un lugar
+GEMINI_SEMAFORO = asyncio.Semaphore(int(os.getenv("GEMINI_CONCURRENCIA", "16")))
+
+# Segundos máximos por llamada a Gemini antes de usar la respuesta predefinida
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+
+# Respuestas progresivas: el mensaje se edita a medida que Gemini genera el texto
+STREAMING = os.getenv("STREAMING", "0") == "1"
+STREAMING_INTERVALO = float(os.getenv("STREAMING_INTERVALO", "1.5"))
+
+# Clasificador de intenciones de las respuestas predefinidas, compilado una sola vez
+ROUTER = IntentRouter()
 
 def obtener_respuesta_predefinida(texto):
     """Obtener respuesta predefinida basada en el texto del usuario"""
-    texto_lower = texto.lower()
+    # Primero buscar en documentos y resoluciones oficiales, ordenados por relevancia
+    resultados = RETRIEVER.buscar(texto, k=RESULTADOS_POR_CONSULTA)
+    if resultados:
+        if resultados[0].fuente == "documento":
+            return formatear_documento(resultados[0].doc_id, resultados)
+        return formatear_resolucion(resultados[0].doc_id, resultados)
     
-    # Primero buscar en documentos oficiales
-    document_response = buscar_en_documentos(texto_lower)
-    if document_response:
-        return document_response
+    # Si no hay documento o resolución específica, usar la respuesta predefinida de la intención
+    intencion, _ = ROUTER.clasificar(texto)
+    return RESPUESTAS_PREDEFINIDAS[intencion]
+
+# Clasificador local: las consultas frecuentes reconocidas con confianza se responden sin Gemini
+CLASIFICADOR = IntentClassifier.entrenar(
+    *ejemplos_de_entrenamiento(RESPUESTAS_PREDEFINIDAS),
+    umbral=float(os.getenv("CLASIFICADOR_UMBRAL", "0.45")),
+    margen=float(os.getenv("CLASIFICADOR_MARGEN", "0.1"))
+)
+
+# Registrar las consultas con la clase predicha para etiquetarlas y reentrenar el clasificador
+REGISTRO_CONSULTAS = os.getenv("REGISTRO_CONSULTAS", "0") == "1"
+
+def articulos_relevantes(doc_id, articulos, resultados, limite=3):
+    """Artículos del documento ordenados por relevancia, completando con los primeros"""
+    seleccion = [r.articulo for r in resultados if r.doc_id == doc_id and r.articulo]
+    for article in articulos:
+        if len(seleccion) >= limite:
+            break
+        if article not in seleccion:
+            seleccion.append(article)
+    return seleccion[:limite]
+
+def formatear_documento(filename, resultados):
+    """Crear respuesta basada en un documento oficial de la JCE"""
+    document = JCE_DOCUMENTS[filename]
+    info = document.get("informacion", {})
+    category = document.get("categoria", "")
+    keywords = info.get("palabras_clave", [])
+
+    # Crear respuesta basada en el documento
+    response = f"📋 **Documento Oficial JCE**\n\n"
+    response += f"**Título:** {info.get('titulo', filename)}\n"
+    response += f"**Categoría:** {category.title()}\n"
     
-    # Luego buscar en resoluciones oficiales
-    resolution_response = buscar_en_resoluciones(texto_lower)
-    if resolution_response:
-        return resolution_response
+    if info.get("numero"):
+        response += f"**Número:** {info['numero']}\n"
     
-    # Si no hay documento o resolución específica, usar respuestas predefinidas
-    if any(palabra in texto_lower for palabra in ["acta", "nacimiento", "certificado", "partida"]):
-        return RESPUESTAS_PREDEFINIDAS["acta_nacimiento"]
-    elif any(palabra in texto_lower for palabra in ["cambio", "nombre", "modificar", "corregir", "apellido"]):
-        return RESPUESTAS_PREDEFINIDAS["cambio_nombre"]
-    elif any(palabra in texto_lower for palabra in ["naturalizacion", "nacionalidad", "ciudadania", "extranjero", "inmigrante"]):
-        return RESPUESTAS_PREDEFINIDAS["naturalizacion"]
-    elif any(palabra in texto_lower for palabra in ["apostilla", "internacional", "extranjero", "validar", "legalizar"]):
-        return RESPUESTAS_PREDEFINIDAS["apostilla"]
-    elif any(palabra in texto_lower for palabra in ["cedula", "identidad", "documento", "carnet"]):
-        return RESPUESTAS_PREDEFINIDAS["cedula"]
-    elif any(palabra in texto_lower for palabra in ["matrimonio", "casarse", "boda", "casamiento"]):
-        return RESPUESTAS_PREDEFINIDAS["matrimonio"]
-    elif any(palabra in texto_lower for palabra in ["divorcio", "separar", "separacion", "disolver"]):
-        return RESPUESTAS_PREDEFINIDAS["divorcio"]
-    elif any(palabra in texto_lower for palabra in ["adopcion", "adoptar", "hijo", "menor"]):
-        return RESPUESTAS_PREDEFINIDAS["adopcion"]
-    elif any(palabra in texto_lower for palabra in ["defuncion", "muerte", "fallecimiento", "fallecido"]):
-        return RESPUESTAS_PREDEFINIDAS["defuncion"]
-    elif any(palabra in texto_lower for palabra in ["certificado", "buena conducta", "solteria", "nacionalidad", "residencia"]):
-        return RESPUESTAS_PREDEFINIDAS["certificados"]
-    else:
-        return RESPUESTAS_PREDEFINIDAS["general"]
-
-def buscar_en_documentos(texto):
-    """Buscar información en los documentos oficiales de la JCE"""
-    for filename, document in JCE_DOCUMENTS.items():
-        content = document.get("contenido", "").lower()
-        info = document.get("informacion", {})
-        category = document.get("categoria", "")
-        
-        # Buscar coincidencias en el contenido y palabras clave
-        keywords = info.get("palabras_clave", [])
-        if any(palabra in content for palabra in texto.split()) or any(palabra in texto for palabra in keywords):
-            # Crear respuesta basada en el documento
-            response = f"📋 **Documento Oficial JCE**\n\n"
-            response += f"**Título:** {info.get('titulo', filename)}\n"
-            response += f"**Categoría:** {category.title()}\n"
-            
-            if info.get("numero"):
-                response += f"**Número:** {info['numero']}\n"
-            
-            if info.get("fecha"):
-                response += f"**Fecha:** {info['fecha']}\n\n"
-            
-            # Agregar artículos relevantes
-            if info.get("articulos"):
-                response += "**Artículos relevantes:**\n"
-                for article in info["articulos"][:3]:
-                    response += f"• Artículo {article['numero']}: {article['contenido']}\n"
-                response += "\n"
-            
-            # Agregar capítulos
-            if info.get("capitulos"):
-                response += "**Capítulos:**\n"
-                for chapter in info["capitulos"][:2]:
-                    response += f"• Capítulo {chapter['numero']}: {chapter['contenido']}\n"
-                response += "\n"
-            
-            # Agregar palabras clave
-            if keywords:
-                response += f"**Temas:** {', '.join(keywords[:5])}\n\n"
-            
-            response += "ℹ️ *Esta información está basada en documentos oficiales de la JCE*"
-            return response
+    if info.get("fecha"):
+        response += f"**Fecha:** {info['fecha']}\n\n"
+    
+    # Agregar artículos relevantes
+    if info.get("articulos"):
+        response += "**Artículos relevantes:**\n"
+        for article in articulos_relevantes(filename, info["articulos"], resultados):
+            response += f"• Artículo {article['numero']}: {article['contenido']}\n"
+        response += "\n"
+    
+    # Agregar capítulos
+    if info.get("capitulos"):
+        response += "**Capítulos:**\n"
+        for chapter in info["capitulos"][:2]:
+            response += f"• Capítulo {chapter['numero']}: {chapter['contenido']}\n"
+        response += "\n"
     
-    return None
+    # Agregar palabras clave
+    if keywords:
+        response += f"**Temas:** {', '.join(keywords[:5])}\n\n"
+    
+    response += "ℹ️ *Esta información está basada en documentos oficiales de la JCE*"
+    return response
 
-def buscar_en_resoluciones(texto):
-    """Buscar información en las resoluciones oficiales de la JCE"""
-    for title, resolution in JCE_RESOLUTIONS.items():
-        content = resolution.get("contenido", "").lower()
-        processed = resolution.get("contenido_procesado", {})
-        
-        # Buscar coincidencias en el contenido
-        if any(palabra in content for palabra in texto.split()):
-            # Crear respuesta basada en la resolución
-            response = f"📋 **Información Oficial JCE**\n\n"
-            response += f"**Resolución:** {title}\n"
-            
-            if processed.get("numero_resolucion"):
-                response += f"**Número:** {processed['numero_resolucion']}\n"
-            
-            if processed.get("fecha"):
-                response += f"**Fecha:** {processed['fecha']}\n\n"
-            
-            # Agregar artículos relevantes
-            if processed.get("articulos"):
-                response += "**Disposiciones relevantes:**\n"
-                for article in processed["articulos"][:3]:
-                    response += f"• Artículo {article['numero']}: {article['contenido']}\n"
-                response += "\n"
-            
-            # Agregar información de aplicación
-            if processed.get("aplicacion"):
-                response += "**Aplicación:**\n"
-                for app in processed["aplicacion"][:2]:
-                    response += f"• {app}\n"
-                response += "\n"
-            
-            response += "ℹ️ *Esta información está basada en resoluciones oficiales de la JCE*"
-            return response
+def formatear_resolucion(title, resultados):
+    """Crear respuesta basada en una resolución oficial de la JCE"""
+    processed = JCE_RESOLUTIONS[title].get("contenido_procesado", {})
+
+    # Crear respuesta basada en la resolución
+    response = f"📋 **Información Oficial JCE**\n\n"
+    response += f"**Resolución:** {title}\n"
+    
+    if processed.get("numero_resolucion"):
+        response += f"**Número:** {processed['numero_resolucion']}\n"
+    
+    if processed.get("fecha"):
+        response += f"**Fecha:** {processed['fecha']}\n\n"
     
-    return None
+    # Agregar artículos relevantes
+    if processed.get("articulos"):
+        response += "**Disposiciones relevantes:**\n"
+        for article in articulos_relevantes(title, processed["articulos"], resultados):
+            response += f"• Artículo {article['numero']}: {article['contenido']}\n"
+        response += "\n"
+    
+    # Agregar información de aplicación
+    if processed.get("aplicacion"):
+        response += "**Aplicación:**\n"
+        for app in processed["aplicacion"][:2]:
+            response += f"• {app}\n"
+        response += "\n"
+    
+    response += "ℹ️ *Esta información está basada en resoluciones oficiales de la JCE*"
+    return response
+
+def referencia_pasaje(pasaje):
+    """Título del documento con el artículo y la página del pasaje"""
+    referencia = pasaje.titulo
+    if pasaje.articulo:
+        referencia += f", Art. {pasaje.articulo}"
+    if pasaje.pagina:
+        referencia += f", pág. {pasaje.pagina}"
+    return referencia
+
+def construir_contexto(pasajes, max_tokens=None):
+    """Sección del prompt con los pasajes oficiales numerados para citarlos, hasta `max_tokens` tokens;
+    devuelve el texto y cuántos pasajes incluyó (los primeros, que son los más relevantes)"""
+    encabezado = "Fuentes oficiales JCE (cita con su número, p. ej. [1]):\n"
+    disponible = max_tokens - estimar_tokens(encabezado) if max_tokens is not None else None
+    lineas = []
+    for numero, (pasaje, contenido, _) in enumerate(pasajes, 1):
+        # Espacios y saltos de línea de la extracción del PDF colapsados para no gastar tokens
+        linea = f"[{numero}] {referencia_pasaje(pasaje)}: {' '.join(contenido.split())}"
+        # Los pasajes vienen ordenados por relevancia: los que no caben son los menos relevantes
+        if disponible is not None:
+            disponible -= estimar_tokens(linea)
+            if disponible < 0:
+                break
+        lineas.append(linea)
+
+    if not lineas:
+        return "", 0
+    return encabezado + "\n".join(lineas) + "\n\n", len(lineas)
+
+def agregar_fuentes(respuesta, pasajes):
+    """Agregar al final de la respuesta las fuentes que Gemini citó; `pasajes` son solo los que
+    recibió en el prompt, así una cita a un pasaje que no vio no se agrega como fuente"""
+    citados = sorted({int(numero) for numero in CITA.findall(respuesta) if 0 < int(numero) <= len(pasajes)})
+    if not citados:
+        return respuesta
+    fuentes = "\n".join(f"[{numero}] {referencia_pasaje(pasajes[numero - 1][0])}" for numero in citados)
+    return f"{respuesta}{FUENTES}{fuentes}"
+
+def quitar_citas(respuesta):
+    """Respuesta sin la lista de fuentes ni las citas [n]: en los turnos siguientes los pasajes
+    se vuelven a numerar y las citas viejas apuntarían a otras fuentes"""
+    return CITA_EN_TEXTO.sub("", respuesta.split(FUENTES, 1)[0])
 
 # Guardar el mensaje del usuario
-def handle_user_message(message):
-    user_id = message.from_user.id
-    if user_id not in mensajes:
-        mensajes[user_id] = {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": (
-                        "Eres un asistente virtual especializado en Registro Civil de República Dominicana. "
-                        "Responde a los gestores usando resoluciones y reglas oficiales de la Junta Central Electoral."
-                    )
-                }
-            ]
-        }
-
-    mensajes[user_id]["messages"].append({
-        "role": "user",
-        "content": message.text
-    })
-
-    # Limitar historial para evitar exceso
-    mensajes[user_id]["messages"] = mensajes[user_id]["messages"][-20:]
+async def handle_user_message(message):
+    await HISTORIAL.append(message.from_user.id, "user", message.text)
+
+async def llamar_gemini(prompt, streaming=None):
+    """Generar la respuesta con el proveedor configurado, sin ocupar un hilo por llamada"""
+    if streaming is None:
+        return (await LLM.generar(prompt)).strip()
+
+    # Los mensajes a Telegram se envían en segundo plano: no cuentan para el tiempo límite
+    streaming.iniciar()
+    partes = []
+    async for fragmento in LLM.generar_stream(prompt):
+        partes.append(fragmento)
+        streaming.actualizar("".join(partes))
+    return "".join(partes).strip()
+
+async def generar_resumen(prompt):
+    """Llamada al modelo para los resúmenes del historial, con prioridad baja en la cuota"""
+    # Los resúmenes consumen la cuota global, que es la de la API, pero solo cuando el bucket
+    # global está lleno: nunca le quitan a una respuesta el token que necesita. El bucket
+    # "resumenes" limita además cuántos resúmenes se hacen por minuto
+    if not await LIMITADOR.acquire("resumenes", ESPERA_MAXIMA, reserva=LIMITADOR.global_bucket.capacidad - 1):
+        return None
+    async with GEMINI_SEMAFORO:
+        return await asyncio.wait_for(llamar_gemini(prompt), GEMINI_TIMEOUT)
+
+# Resumen en segundo plano de los turnos antiguos cuando la conversación crece
+RESUMIDOR = Summarizer(
+    HISTORIAL,
+    generar_resumen,
+    umbral_tokens=int(os.getenv("RESUMEN_UMBRAL_TOKENS", "1500")),
+    conservar=int(os.getenv("RESUMEN_CONSERVAR", "6"))
+)
+
+def es_primera_pregunta(turnos):
+    """Indicar si el mensaje no tiene turnos anteriores ni resumen (solo el sistema y el mensaje)"""
+    return len(turnos) <= 2
 
 # Generar respuesta con Gemini
-async def generate_response(message):
-    global ultima_llamada, llamadas_por_minuto
-    
-    # Control de límites
-    tiempo_actual = time.time()
-    if tiempo_actual - ultima_llamada < 60:  # Menos de 1 minuto
-        llamadas_por_minuto += 1
-        if llamadas_por_minuto > 10:  # Límite conservador
-            return obtener_respuesta_predefinida(message.text)
-    else:
-        llamadas_por_minuto = 1
-        ultima_llamada = tiempo_actual
-
+async def generate_response(message, streaming=None):
     user_id = message.from_user.id
-    prompt = ""
-
-    for msg in mensajes[user_id]["messages"]:
-        if msg["role"] == "user":
-            prompt += f"Usuario: {msg['content']}\n"
-        elif msg["role"] == "assistant":
-            prompt += f"Asistente: {msg['content']}\n"
-        elif msg["role"] == "system":
-            prompt = f"{msg['content']}\n\n" + prompt
 
-    try:
-        # Llamar a Gemini
-        response = await asyncio.to_thread(model.generate_content, prompt)
-        respuesta_texto = response.text.strip()
+    clase, confianza = CLASIFICADOR.clasificar(message.text)
+    if REGISTRO_CONSULTAS:
+        await asyncio.to_thread(registrar_consulta, message.text, clase, confianza)
+
+    if clase != CLASE_LLM:
+        # Consulta frecuente reconocida: respuesta inmediata, sin búsqueda ni llamada a Gemini,
+        # salvo que la conversación tenga turnos anteriores que cambien su sentido
+        turnos = await HISTORIAL.turnos(user_id)
+        if es_primera_pregunta(turnos):
+            respuesta_directa = CLASIFICADOR.respuestas[clase]
+            await HISTORIAL.append(user_id, "assistant", respuesta_directa)
+            return respuesta_directa
+        pasajes = await asyncio.to_thread(buscar_pasajes, message.text)
+    else:
+        # La búsqueda de pasajes y la lectura del historial se hacen a la vez
+        pasajes, turnos = await asyncio.gather(
+            asyncio.to_thread(buscar_pasajes, message.text),
+            HISTORIAL.turnos(user_id)
+        )
+    clave_cache = CACHE_RESPUESTAS.clave(message.text, huella_contexto(pasajes))
+
+    # Respuesta en caché: no hace falta llamar a Gemini ni consumir cuota. Las claves no
+    # incluyen la conversación, así que solo se usan para la primera pregunta
+    primera = es_primera_pregunta(turnos)
+    if primera:
+        respuesta_cache = await CACHE_RESPUESTAS.get(clave_cache)
+        if respuesta_cache is None and CACHE_SIMILARES is not None:
+            respuesta_cache = CACHE_SIMILARES.get(message.text)
+        if respuesta_cache is not None:
+            # En caché está la respuesta que vio el usuario; el historial la guarda sin las fuentes
+            await HISTORIAL.append(user_id, "assistant", quitar_citas(respuesta_cache))
+            return respuesta_cache
+    
+    # Control de límites: esperar turno y, si no llega a tiempo, usar la respuesta predefinida
+    if not await LIMITADOR.acquire(user_id, ESPERA_MAXIMA):
+        return obtener_respuesta_predefinida(message.text)
 
-        # Guardar respuesta
-        mensajes[user_id]["messages"].append({
-            "role": "assistant",
-            "content": respuesta_texto
-        })
+    RESUMIDOR.programar(user_id, turnos)
+    contexto, incluidos = construir_contexto(pasajes, PROMPT.presupuesto_pasajes(turnos))
+    prompt = PROMPT.construir(turnos, contexto)
 
+    try:
+        # Llamar a Gemini (como máximo GEMINI_CONCURRENCIA llamadas a la vez)
+        async with GEMINI_SEMAFORO:
+            respuesta_texto = await asyncio.wait_for(llamar_gemini(prompt, streaming), GEMINI_TIMEOUT)
+
+        # Guardar respuesta (el historial sin las citas ni la lista de fuentes, que solo ve el usuario)
+        await HISTORIAL.append(user_id, "assistant", quitar_citas(respuesta_texto))
+
+        respuesta_texto = agregar_fuentes(respuesta_texto, pasajes[:incluidos])
+        if primera:
+            await CACHE_RESPUESTAS.set(clave_cache, respuesta_texto)
+            if CACHE_SIMILARES is not None:
+                CACHE_SIMILARES.set(message.text, respuesta_texto)
         return respuesta_texto
         
     except Exception as e:
@@ -518,19 +701,51 @@ async def generate_response(message):
 # Manejar mensajes entrantes
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        handle_user_message(update.message)
-        response = await generate_response(update.message)
-        await update.message.reply_text(response)
+        await handle_user_message(update.message)
+        if STREAMING:
+            streaming = StreamingReply(update.message, intervalo=STREAMING_INTERVALO)
+            response = await generate_response(update.message, streaming)
+            await streaming.finalizar(response)
+        else:
+            response = await generate_response(update.message)
+            await update.message.reply_text(response)
     except Exception as e:
         print("Error:", e)
         await update.message.reply_text("⚠️ Ocurrió un error al procesar tu mensaje.")
 
+async def cerrar(application):
+    """Terminar los resúmenes en curso, escribir los turnos pendientes del historial y cerrar la
+    caché en disco al detener el bot"""
+    await RESUMIDOR.close()
+    await HISTORIAL.close()
+    await asyncio.to_thread(CACHE_RESPUESTAS.close)
+
 # Función principal
 def main():
-    bot = Application.builder().token(TELEGRAM_TOKEN).build()
+    bot = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .concurrent_updates(ChatOrderedUpdateProcessor(CONCURRENCIA, PENDIENTES_MAX))
+        .update_queue(asyncio.Queue(maxsize=CONCURRENCIA))
+        .post_shutdown(cerrar)
+        .build()
+    )
     bot.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
     print("🤖 Bot ejecutándose...")
-    bot.run_polling(allowed_updates=Update.ALL_TYPES)
+    if WEBHOOK_URL:
+        run_webhook(
+            bot,
+            WEBHOOK_URL,
+            host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", "8443")),
+            path=os.getenv("WEBHOOK_PATH", "/telegram"),
+            secreto=os.getenv("WEBHOOK_SECRET") or None,
+            registrar=os.getenv("WEBHOOK_REGISTRAR", "1") == "1",
+            metricas=LIMITADOR.metricas
+        )
+    else:
+        bot.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Historial de conversaciones con memoria acotada
+Cada usuario guarda sus últimos turnos como registros compactos; las conversaciones
+inactivas vencen tras un TTL y, si se supera el presupuesto de memoria, se desalojan
+las usadas hace más tiempo (LRU). El mensaje de sistema es uno solo para todos
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from prompt_builder import estimar_tokens
+
+# Roles internados: todos los turnos comparten las mismas cadenas
+SYSTEM = sys.intern("system")
+USER = sys.intern("user")
+ASSISTANT = sys.intern("assistant")
+# Resumen de los turnos antiguos que ya se retiraron de la conversación
+SUMMARY = sys.intern("summary")
+ROLES = {SYSTEM: SYSTEM, USER: USER, ASSISTANT: ASSISTANT, SUMMARY: SUMMARY}
+
+
+class Turn:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role, content):
+        self.role = ROLES[role]
+        self.content = content
+        # Tokens estimados de la línea del turno en el prompt, calculados una sola vez
+        self.tokens = estimar_tokens(content) + 3
+
+    def tamano(self):
+        """Memoria aproximada del turno en bytes"""
+        return sys.getsizeof(self) + sys.getsizeof(self.content)
+
+
+class Conversation:
+    __slots__ = ("turnos", "resumen", "tamano", "ultimo_uso")
+
+    def __init__(self, max_turnos):
+        self.turnos = deque(maxlen=max_turnos)
+        self.resumen = None
+        self.tamano = sys.getsizeof(self) + sys.getsizeof(self.turnos)
+        self.ultimo_uso = time.monotonic()
+
+
+class ConversationStore:
+    def __init__(self, system_prompt, max_turnos=100, ttl=86400, max_bytes=64 * 1024 * 1024):
+        self.system = Turn(SYSTEM, system_prompt)
+        self.max_turnos = max_turnos
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # user_id -> Conversation, en orden de uso (la más reciente al final)
+        self.conversaciones = OrderedDict()
+        self.tamano = 0
+        self.lock = threading.Lock()
+
+        self.vencidas = 0
+        self.desalojadas = 0
+
+    def __len__(self):
+        return len(self.conversaciones)
+
+    def append(self, user_id, role, content):
+        """Agregar un turno a la conversación de un usuario"""
+        turno = Turn(role, content)
+        with self.lock:
+            ahora = time.monotonic()
+            conversacion = self.conversaciones.get(user_id)
+            if conversacion is None:
+                conversacion = self.conversaciones[user_id] = Conversation(self.max_turnos)
+                self.tamano += conversacion.tamano
+            else:
+                self.conversaciones.move_to_end(user_id)
+            conversacion.ultimo_uso = ahora
+
+            if len(conversacion.turnos) == self.max_turnos:
+                # El deque descarta el turno más antiguo al agregar uno nuevo
+                descartado = conversacion.turnos[0].tamano()
+                conversacion.tamano -= descartado
+                self.tamano -= descartado
+            conversacion.turnos.append(turno)
+            tamano = turno.tamano()
+            conversacion.tamano += tamano
+            self.tamano += tamano
+
+            self._purgar(ahora)
+
+    def turnos(self, user_id):
+        """Turnos de la conversación, empezando por el mensaje de sistema y el resumen si lo hay"""
+        with self.lock:
+            conversacion = self.conversaciones.get(user_id)
+            if conversacion is None:
+                return [self.system]
+            conversacion.ultimo_uso = time.monotonic()
+            self.conversaciones.move_to_end(user_id)
+            if conversacion.resumen is None:
+                return [self.system, *conversacion.turnos]
+            return [self.system, conversacion.resumen, *conversacion.turnos]
+
+    def compactar(self, user_id, resumen, cantidad):
+        """Reemplazar los `cantidad` turnos más antiguos por un resumen"""
+        with self.lock:
+            conversacion = self.conversaciones.get(user_id)
+            if conversacion is None:
+                return
+            liberado = 0
+            for _ in range(min(cantidad, len(conversacion.turnos))):
+                liberado += conversacion.turnos.popleft().tamano()
+            if conversacion.resumen is not None:
+                liberado += conversacion.resumen.tamano()
+            conversacion.resumen = Turn(SUMMARY, resumen)
+            diferencia = conversacion.resumen.tamano() - liberado
+            conversacion.tamano += diferencia
+            self.tamano += diferencia
+
+    def _purgar(self, ahora):
+        """Eliminar conversaciones inactivas y, si hace falta, las menos usadas"""
+        limite = ahora - self.ttl
+        while self.conversaciones:
+            user_id, conversacion = next(iter(self.conversaciones.items()))
+            if conversacion.ultimo_uso < limite:
+                self.vencidas += 1
+            elif self.tamano > self.max_bytes and len(self.conversaciones) > 1:
+                self.desalojadas += 1
+            else:
+                break
+            self._eliminar(user_id)
+
+    def _eliminar(self, user_id):
+        conversacion = self.conversaciones.pop(user_id)
+        self.tamano -= conversacion.tamano
+
+    def purgar(self):
+        """Eliminar las conversaciones vencidas (también se hace al agregar turnos)"""
+        with self.lock:
+            self._purgar(time.monotonic())
+
+    def stats(self):
+        """Tamaño y contadores de desalojo"""
+        return {
+            "conversaciones": len(self.conversaciones),
+            "bytes": self.tamano,
+            "vencidas": self.vencidas,
+            "desalojadas": self.desalojadas,
+        }
@@ -0,0 +1,173 @@
+"""
+Extracción de la información estructurada de documentos y resoluciones JCE
+Todas las expresiones se compilan una sola vez y el texto se recorre en una sola
+pasada: una expresión de anclas encuentra las posiciones donde puede empezar algún
+elemento (artículos, capítulos, disposiciones, números, fechas, contactos...) y en
+cada una se prueban solo las expresiones que empiezan con ese carácter. Cada elemento
+se entrega con su posición en el texto
+"""
+
+import re
+from collections import namedtuple
+
+# Tipo -> expresión. Se aplican sobre el texto en minúsculas, salvo las de TEXTO_ORIGINAL,
+# que distinguen mayúsculas y se aplican sobre el texto tal cual
+PATRONES = {
+    "articulo": r'artículo\s+(\d+)\.?\s*([^.]*\.)',
+    "capitulo": r'capítulo\s+(\d+)\.?\s*([^.]*\.)',
+    "disposicion": r'disposición\s+(\w+)\.?\s*([^.]*\.)',
+    "resolucion_no": r'resolución\s+no\.?\s*(\d+)',
+    "resolucion": r'resolución\s+(\d+)',
+    "no": r'no\.?\s*(\d+)',
+    "numero": r'número\s*(\d+)',
+    "guion": r'(\d+)-(\d{4})',
+    "res": r'res\.\s*(\d+)',
+    "fecha_barra": r'(\d{1,2}/\d{1,2}/\d{4})',
+    "fecha_guion": r'(\d{1,2}-\d{1,2}-\d{4})',
+    "fecha_texto": r'(\d{1,2}\s+de\s+\w+\s+de\s+\d{4})',
+    "telefono": r'\(\d{3}\)\s*\d{3}-\d{4}',
+    "aplicacion": r'aplicación[^.]*\.',
+    "vigencia": r'vigencia[^.]*\.',
+    "entrada_en_vigor": r'entrada en vigor[^.]*\.',
+    "alcance": r'alcance[^.]*\.',
+    "ambito": r'ámbito de aplicación[^.]*\.',
+    "sancion": r'sanción[^.]*\.',
+}
+TEXTO_ORIGINAL = {"fecha_texto"}
+COMPILADOS = {tipo: re.compile(patron) for tipo, patron in PATRONES.items()}
+
+# Los correos pueden empezar en cualquier letra, así que se buscan aparte y solo si hay "@"
+EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# Posiciones donde puede empezar algún patrón: cada alternativa empieza con un carácter
+# literal (para que el motor descarte rápido las demás posiciones) y su lookahead cubre
+# lo que sigue en todas las expresiones que empiezan con ese carácter
+ANCLAS = re.compile(
+    r"a(?=rtículo|plicación|lcance)|c(?=apítulo)|d(?=isposición)|n(?=o\.?\s*\d|úmero\s*\d)"
+    r"|r(?=es\.|esolución)|v(?=igencia)|e(?=ntrada en vigor)|s(?=anción)|á(?=mbito de aplicación)"
+    r"|\((?=\d{3}\))|\d(?=\d*-\d{4}|\d?[/-]|\d?\s+de\s)"
+)
+
+
+def agrupar_por_inicial(patrones):
+    """Carácter inicial -> tipos cuyas expresiones empiezan con él (todos los dígitos van con "0")"""
+    por_inicial = {}
+    for tipo, patron in patrones.items():
+        inicial = "0" if patron.startswith((r'(\d', r'\d')) else patron.lstrip("\\")[0]
+        por_inicial.setdefault(inicial, []).append(tipo)
+    return por_inicial
+
+
+POR_INICIAL = agrupar_por_inicial(PATRONES)
+
+# Orden en que se prueban las expresiones del número de cada tipo de documento
+NUMERO_DOCUMENTO = ("no", "numero", "guion", "res")
+NUMERO_RESOLUCION = ("resolucion_no", "resolucion", "no", "res")
+FECHA = ("fecha_barra", "fecha_guion", "fecha_texto")
+APLICACION = ("aplicacion", "vigencia", "entrada_en_vigor", "alcance", "ambito")
+
+PALABRAS_CLAVE = [
+    "acta", "nacimiento", "cedula", "identidad", "matrimonio",
+    "divorcio", "naturalizacion", "apostilla", "registro civil",
+    "junta central electoral", "jce", "documento", "tramite",
+    "requisito", "costo", "tiempo", "oficina", "horario"
+]
+
+# Tipo, posición de inicio y fin en el texto, texto completo y grupos capturados
+Elemento = namedtuple("Elemento", ["tipo", "inicio", "fin", "texto", "grupos"])
+
+
+def minusculas(texto):
+    """Texto en minúsculas con las mismas posiciones que el original"""
+    bajo = texto.lower()
+    if len(bajo) == len(texto):
+        return bajo
+    # Algunos caracteres (como "İ") se convierten en dos; se deja solo el primero
+    return "".join(caracter.lower()[0] for caracter in texto)
+
+
+def escanear(texto, bajo=None):
+    """Elementos del texto en orden de posición; los de un mismo tipo no se solapan, como con re.findall"""
+    bajo = minusculas(texto) if bajo is None else bajo
+    elementos = []
+    # Tipo -> posición donde termina su último elemento
+    fin = dict.fromkeys(PATRONES, 0)
+
+    for ancla in ANCLAS.finditer(bajo):
+        inicio = ancla.start()
+        inicial = bajo[inicio]
+        for tipo in POR_INICIAL["0" if inicial.isdigit() else inicial]:
+            if inicio < fin[tipo]:
+                continue
+            match = COMPILADOS[tipo].match(texto if tipo in TEXTO_ORIGINAL else bajo, inicio)
+            if match is None:
+                continue
+            fin[tipo] = match.end()
+            grupos = tuple(texto[desde:hasta] for desde, hasta in (match.span(i) for i in range(1, match.re.groups + 1)))
+            elementos.append(Elemento(tipo, inicio, match.end(), texto[inicio:match.end()], grupos))
+
+    if "@" in texto:
+        elementos.extend(Elemento("email", m.start(), m.end(), m.group(), ()) for m in EMAIL.finditer(texto))
+        elementos.sort(key=lambda elemento: elemento.inicio)
+    return elementos
+
+
+def agrupar(elementos):
+    """Tipo -> elementos de ese tipo, en orden de posición"""
+    por_tipo = {}
+    for elemento in elementos:
+        por_tipo.setdefault(elemento.tipo, []).append(elemento)
+    return por_tipo
+
+
+def primero(por_tipo, tipos, defecto):
+    """Primer grupo del primer elemento, probando los tipos en orden de prioridad"""
+    for tipo in tipos:
+        if tipo in por_tipo:
+            return por_tipo[tipo][0].grupos[0]
+    return defecto
+
+
+def numerados(por_tipo, tipo, clave):
+    """Elementos con número (o tipo) y contenido, como artículos o disposiciones"""
+    return [{clave: e.grupos[0], "contenido": e.grupos[1].strip()} for e in por_tipo.get(tipo, [])]
+
+
+def contactos(por_tipo):
+    """Teléfonos y correos electrónicos"""
+    return (
+        [{"tipo": "telefono", "valor": e.texto} for e in por_tipo.get("telefono", [])]
+        + [{"tipo": "email", "valor": e.texto} for e in por_tipo.get("email", [])]
+    )
+
+
+def informacion_documento(texto, titulo):
+    """Información estructurada de un documento JCE"""
+    bajo = minusculas(texto)
+    por_tipo = agrupar(escanear(texto, bajo))
+    return {
+        "titulo": titulo,
+        "numero": primero(por_tipo, NUMERO_DOCUMENTO, "No especificado"),
+        "fecha": primero(por_tipo, FECHA, "No especificada"),
+        "articulos": numerados(por_tipo, "articulo", "numero"),
+        "capitulos": numerados(por_tipo, "capitulo", "numero"),
+        "disposiciones": numerados(por_tipo, "disposicion", "tipo"),
+        "contactos": contactos(por_tipo),
+        "palabras_clave": [palabra for palabra in PALABRAS_CLAVE if palabra in bajo],
+    }
+
+
+def informacion_resolucion(texto, titulo):
+    """Información estructurada de una resolución JCE"""
+    por_tipo = agrupar(escanear(texto))
+    return {
+        "titulo": titulo,
+        "numero_resolucion": primero(por_tipo, NUMERO_RESOLUCION, "No especificado"),
+        "fecha": primero(por_tipo, FECHA, "No especificada"),
+        "articulos": numerados(por_tipo, "articulo", "numero"),
+        "disposiciones": numerados(por_tipo, "disposicion", "tipo"),
+        # Agrupadas por sección, en el orden de APLICACION
+        "aplicacion": [e.texto for tipo in APLICACION for e in por_tipo.get(tipo, [])],
+        "sanciones": [e.texto for e in por_tipo.get("sancion", [])],
+        "contactos": contactos(por_tipo),
+    }
@@ -0,0 +1,168 @@
+"""
+Servidor falso de la API de Telegram para probar el bot sin conexión
+Implementa los métodos que usa el bot (getMe, setWebhook, getUpdates, sendMessage,
+editMessageText...), guarda los mensajes enviados y entrega updates por webhook o
+por getUpdates.
+Uso: python fake_telegram.py [--puerto 8081]
+y en el .env del bot: TELEGRAM_API_URL=http://localhost:8081/bot
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import aiohttp
+from aiohttp import web
+
+from webhook import SECRET_HEADER
+
+BOT_INFO = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "Bot de prueba",
+    "username": "bot_de_prueba",
+    "can_join_groups": True,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+
+def leer_parametros(formulario):
+    """Los parámetros llegan como formulario con valores codificados en JSON"""
+    parametros = {}
+    for key, value in formulario.items():
+        try:
+            parametros[key] = json.loads(value)
+        except (TypeError, ValueError):
+            parametros[key] = value
+    return parametros
+
+
+class FakeTelegramServer:
+    def __init__(self):
+        self.webhook = None
+        self.secreto = None
+        self.enviados = []
+        self.updates = asyncio.Queue()
+        self.ids_update = itertools.count(1)
+        self.ids_mensaje = itertools.count(1)
+        # chat_id -> cola de mensajes que el bot envió a ese chat
+        self.respuestas = {}
+        self.sesion = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{metodo}", self.atender)
+        self.app.on_cleanup.append(self._cerrar)
+
+    def _cola(self, chat_id):
+        return self.respuestas.setdefault(chat_id, asyncio.Queue())
+
+    def _mensaje(self, chat_id, texto, message_id=None):
+        return {
+            "message_id": message_id or next(self.ids_mensaje),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": texto,
+        }
+
+    async def atender(self, request):
+        """Responder a un método de la API del bot"""
+        metodo = request.match_info["metodo"]
+        parametros = leer_parametros(await request.post())
+
+        if metodo == "getMe":
+            resultado = BOT_INFO
+        elif metodo == "setWebhook":
+            self.webhook = parametros.get("url")
+            self.secreto = parametros.get("secret_token")
+            resultado = True
+        elif metodo == "deleteWebhook":
+            self.webhook = None
+            resultado = True
+        elif metodo == "getUpdates":
+            resultado = await self._obtener_updates(parametros)
+        elif metodo in ("sendMessage", "editMessageText"):
+            mensaje = self._mensaje(parametros["chat_id"], parametros["text"], parametros.get("message_id"))
+            mensaje["from"] = BOT_INFO
+            self.enviados.append((metodo, mensaje))
+            await self._cola(mensaje["chat"]["id"]).put((metodo, mensaje))
+            resultado = mensaje
+        else:
+            resultado = True
+
+        return web.json_response({"ok": True, "result": resultado})
+
+    async def _obtener_updates(self, parametros):
+        """Long polling: esperar hasta `timeout` segundos por updates pendientes"""
+        try:
+            primero = await asyncio.wait_for(self.updates.get(), timeout=parametros.get("timeout") or 0.01)
+        except asyncio.TimeoutError:
+            return []
+        updates = [primero]
+        while not self.updates.empty():
+            updates.append(self.updates.get_nowait())
+        return updates
+
+    async def enviar(self, chat_id, texto, user_id=None):
+        """Simular un mensaje de un usuario: se entrega por webhook si hay uno registrado"""
+        mensaje = self._mensaje(chat_id, texto)
+        mensaje["from"] = {"id": user_id or chat_id, "is_bot": False, "first_name": f"Usuario {chat_id}"}
+        update = {"update_id": next(self.ids_update), "message": mensaje}
+
+        if self.webhook is None:
+            await self.updates.put(update)
+            return
+        if self.sesion is None:
+            self.sesion = aiohttp.ClientSession()
+        headers = {SECRET_HEADER: self.secreto} if self.secreto else {}
+        async with self.sesion.post(self.webhook, json=update, headers=headers) as response:
+            response.raise_for_status()
+
+    async def respuesta(self, chat_id, timeout=30):
+        """Esperar el siguiente mensaje que el bot envíe (o edite) en un chat"""
+        return await asyncio.wait_for(self._cola(chat_id).get(), timeout)
+
+    async def _cerrar(self, _app):
+        if self.sesion is not None:
+            await self.sesion.close()
+
+
+async def interactivo(puerto):
+    """Enviar al bot cada línea escrita en la consola y mostrar sus respuestas"""
+    servidor = FakeTelegramServer()
+    runner = web.AppRunner(servidor.app)
+    await runner.setup()
+    await web.TCPSite(runner, "localhost", puerto).start()
+    print(f"📡 API falsa de Telegram en http://localhost:{puerto}/bot (Ctrl+D para salir)")
+
+    try:
+        while True:
+            texto = await asyncio.to_thread(input, "> ")
+            await servidor.enviar(1, texto)
+            metodo, mensaje = await servidor.respuesta(1)
+            print(f"[{metodo}] {mensaje['text']}")
+            # Mostrar también las ediciones de las respuestas progresivas
+            try:
+                while True:
+                    metodo, mensaje = await servidor.respuesta(1, timeout=3)
+                    print(f"[{metodo}] {mensaje['text']}")
+            except asyncio.TimeoutError:
+                pass
+    except EOFError:
+        pass
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Servidor falso de la API de Telegram")
+    parser.add_argument("--puerto", type=int, default=8081)
+    args = parser.parse_args()
+    asyncio.run(interactivo(args.puerto))
+
+
+if __name__ == "__main__":
+    main()
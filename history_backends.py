@@ -0,0 +1,230 @@
+"""
+Backends del historial de conversaciones
+- memoria: ConversationStore en el proceso (por defecto)
+- sqlite: archivo compartido entre procesos del mismo equipo, con WAL y escrituras por lotes
+- redis: servidor compartido entre equipos (requiere el paquete redis)
+Todos exponen la misma interfaz asíncrona y no bloquean el loop de eventos; además de los
+turnos guardan el resumen de los turnos antiguos que ya se retiraron de la conversación
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conversation_store import ROLES, SUMMARY, SYSTEM, ConversationStore, Turn
+
+try:
+    import redis.asyncio as redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class MemoryHistory:
+    """Historial en la memoria del proceso"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def append(self, user_id, role, content):
+        self.store.append(user_id, role, content)
+
+    async def turnos(self, user_id):
+        return self.store.turnos(user_id)
+
+    async def compactar(self, user_id, resumen, cantidad):
+        self.store.compactar(user_id, resumen, cantidad)
+
+    async def close(self):
+        pass
+
+
+class SQLiteHistory:
+    """Historial en SQLite; los turnos nuevos se acumulan y se escriben por lotes"""
+
+    # Cada cuántos lotes se eliminan las conversaciones inactivas
+    LIMPIEZA_CADA = 100
+
+    def __init__(self, system_prompt, db_path, max_turnos=100, ttl=86400, intervalo=0.05, max_lote=500):
+        self.system = Turn(SYSTEM, system_prompt)
+        self.max_turnos = max_turnos
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self.max_lote = max_lote
+        # Un solo hilo usa la conexión: las consultas no bloquean el loop y no compiten entre sí
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="historial-sqlite")
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS turnos ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+            "role TEXT NOT NULL, content TEXT NOT NULL, creado REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS turnos_usuario ON turnos (user_id, id)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS resumenes ("
+            "user_id TEXT PRIMARY KEY, resumen TEXT NOT NULL, actualizado REAL NOT NULL)"
+        )
+        self.db.commit()
+
+        # Turnos aún no escritos: (user_id, role, content, creado)
+        self.pendientes = []
+        self.tarea = None
+        self.lotes = 0
+
+    async def _ejecutar(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, funcion, *args)
+
+    async def append(self, user_id, role, content):
+        self.pendientes.append((str(user_id), ROLES[role], content, time.time()))
+        if len(self.pendientes) >= self.max_lote:
+            await self.flush()
+        elif self.tarea is None or self.tarea.done():
+            self.tarea = asyncio.create_task(self._flush_diferido())
+
+    async def _flush_diferido(self):
+        await asyncio.sleep(self.intervalo)
+        await self.flush()
+
+    async def flush(self):
+        """Escribir los turnos pendientes en una sola transacción"""
+        if not self.pendientes:
+            return
+        lote, self.pendientes = self.pendientes, []
+        await self._ejecutar(self._escribir, lote)
+
+    def _escribir(self, lote):
+        with self.db:
+            self.db.executemany("INSERT INTO turnos (user_id, role, content, creado) VALUES (?, ?, ?, ?)", lote)
+            for user_id in {fila[0] for fila in lote}:
+                self.db.execute(
+                    "DELETE FROM turnos WHERE user_id = ? AND id <= ("
+                    "SELECT id FROM turnos WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (user_id, user_id, self.max_turnos)
+                )
+            self.lotes += 1
+            if self.lotes % self.LIMPIEZA_CADA == 0:
+                limite = time.time() - self.ttl
+                self.db.execute(
+                    "DELETE FROM turnos WHERE user_id IN ("
+                    "SELECT user_id FROM turnos GROUP BY user_id HAVING MAX(creado) < ?)",
+                    (limite,)
+                )
+                self.db.execute(
+                    "DELETE FROM resumenes WHERE actualizado < ? AND user_id NOT IN (SELECT user_id FROM turnos)",
+                    (limite,)
+                )
+
+    def _leer(self, user_id):
+        resumen = self.db.execute("SELECT resumen FROM resumenes WHERE user_id = ?", (user_id,)).fetchone()
+        filas = self.db.execute(
+            "SELECT role, content FROM (SELECT id, role, content FROM turnos WHERE user_id = ? "
+            "ORDER BY id DESC LIMIT ?) ORDER BY id",
+            (user_id, self.max_turnos)
+        ).fetchall()
+        return resumen[0] if resumen else None, filas
+
+    def _compactar(self, user_id, resumen, cantidad):
+        with self.db:
+            self.db.execute(
+                "DELETE FROM turnos WHERE id IN (SELECT id FROM turnos WHERE user_id = ? ORDER BY id LIMIT ?)",
+                (user_id, cantidad)
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO resumenes (user_id, resumen, actualizado) VALUES (?, ?, ?)",
+                (user_id, resumen, time.time())
+            )
+
+    async def turnos(self, user_id):
+        user_id = str(user_id)
+        # Los pendientes se toman antes de leer: si se escriben mientras tanto, la lectura
+        # (en el mismo hilo, después de la escritura) ya no los verá dos veces ni los perderá
+        pendientes = [(role, content) for uid, role, content, _ in self.pendientes if uid == user_id]
+        resumen, filas = await self._ejecutar(self._leer, user_id)
+        filas += pendientes
+        turnos = [Turn(role, content) for role, content in filas[-self.max_turnos:]]
+        if resumen is None:
+            return [self.system, *turnos]
+        return [self.system, Turn(SUMMARY, resumen), *turnos]
+
+    async def compactar(self, user_id, resumen, cantidad):
+        # Los turnos a resumir tienen que estar escritos antes de borrarlos
+        await self.flush()
+        await self._ejecutar(self._compactar, str(user_id), resumen, cantidad)
+
+    async def close(self):
+        await self.flush()
+        await self._ejecutar(self.db.close)
+        self.executor.shutdown()
+
+
+class RedisHistory:
+    """Historial en Redis: una lista por usuario, recortada y con vencimiento por inactividad"""
+
+    def __init__(self, system_prompt, url="redis://localhost:6379/0", max_turnos=100, ttl=86400,
+                 cliente=None, prefijo="historial:"):
+        if cliente is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("El backend redis requiere el paquete redis (pip install redis)")
+            cliente = redis.from_url(url)
+        self.system = Turn(SYSTEM, system_prompt)
+        self.cliente = cliente
+        self.max_turnos = max_turnos
+        self.ttl = ttl
+        self.prefijo = prefijo
+
+    async def append(self, user_id, role, content):
+        clave = f"{self.prefijo}{user_id}"
+        turno = json.dumps([ROLES[role], content], ensure_ascii=False)
+        # Una sola ida y vuelta: agregar, recortar y renovar el vencimiento
+        async with self.cliente.pipeline(transaction=True) as pipe:
+            pipe.rpush(clave, turno)
+            pipe.ltrim(clave, -self.max_turnos, -1)
+            pipe.expire(clave, self.ttl)
+            pipe.expire(f"{clave}:resumen", self.ttl)
+            await pipe.execute()
+
+    async def turnos(self, user_id):
+        clave = f"{self.prefijo}{user_id}"
+        async with self.cliente.pipeline(transaction=False) as pipe:
+            pipe.get(f"{clave}:resumen")
+            pipe.lrange(clave, 0, -1)
+            resumen, guardados = await pipe.execute()
+        turnos = [Turn(*json.loads(turno)) for turno in guardados]
+        if resumen is None:
+            return [self.system, *turnos]
+        return [self.system, Turn(SUMMARY, resumen.decode("utf-8")), *turnos]
+
+    async def compactar(self, user_id, resumen, cantidad):
+        clave = f"{self.prefijo}{user_id}"
+        async with self.cliente.pipeline(transaction=True) as pipe:
+            pipe.ltrim(clave, cantidad, -1)
+            pipe.set(f"{clave}:resumen", resumen, ex=self.ttl)
+            await pipe.execute()
+
+    async def close(self):
+        await self.cliente.aclose()
+
+
+def create_history(system_prompt):
+    """Crear el backend de historial configurado en las variables de entorno"""
+    backend = os.getenv("HISTORIAL_BACKEND", "memoria").lower()
+    max_turnos = int(os.getenv("HISTORIAL_TURNOS", "100"))
+    ttl = int(os.getenv("HISTORIAL_TTL", "86400"))
+
+    if backend == "memoria":
+        return MemoryHistory(ConversationStore(
+            system_prompt,
+            max_turnos=max_turnos,
+            ttl=ttl,
+            max_bytes=int(os.getenv("HISTORIAL_MAX_MB", "64")) * 1024 * 1024
+        ))
+    if backend == "sqlite":
+        return SQLiteHistory(system_prompt, os.getenv("HISTORIAL_DB", "historial.db"), max_turnos, ttl)
+    if backend == "redis":
+        return RedisHistory(system_prompt, os.getenv("REDIS_URL", "redis://localhost:6379/0"), max_turnos, ttl)
+    raise ValueError(f"Backend de historial desconocido: {backend}")
@@ -0,0 +1,120 @@
+"""
+Manifiesto de la ingesta incremental
+Por cada archivo fuente registra tamaño, fecha de modificación, hash SHA-256 del
+contenido y la versión del extractor que lo procesó, junto con la entrada que generó
+en el JSON del cargador; así cada ejecución solo procesa los archivos nuevos o
+modificados y quita del JSON los que se eliminaron. Los archivos con páginas escaneadas
+que quedaron sin reconocer se vuelven a procesar cuando el OCR está disponible
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "ingesta_manifest.json"
+FORMAT_VERSION = 1
+
+
+def hash_archivo(path, bloque=1 << 20):
+    """Hash SHA-256 del contenido de un archivo, leído por bloques"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for datos in iter(lambda: f.read(bloque), b""):
+            sha256.update(datos)
+    return sha256.hexdigest()
+
+
+class IngestManifest:
+    def __init__(self, cargador, version_extractor, path=MANIFEST_FILE, ocr_disponible=False):
+        # Cada cargador tiene su propia sección del manifiesto
+        self.cargador = cargador
+        self.version_extractor = version_extractor
+        self.ocr_disponible = ocr_disponible
+        self.path = path
+        self.archivos = self.cargar().get(cargador, {})
+        # Hashes calculados al revisar los archivos, para no leerlos dos veces
+        self.hashes = {}
+        # Archivos registrados o quitados desde que se cargó el manifiesto
+        self.cambios = 0
+
+    def cargar(self):
+        """Secciones de todos los cargadores guardadas en el manifiesto"""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        if manifiesto.get("version") != FORMAT_VERSION:
+            return {}
+        return manifiesto.get("cargadores", {})
+
+    def save(self):
+        """Guardar la sección de este cargador sin tocar las de los demás"""
+        cargadores = self.cargar()
+        cargadores[self.cargador] = self.archivos
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"version": FORMAT_VERSION, "cargadores": cargadores}, f, ensure_ascii=False, indent=2)
+
+    def sin_cambios(self, path):
+        """Indicar si el archivo ya se procesó con esta versión del extractor y no cambió"""
+        entrada = self.archivos.get(path)
+        if entrada is None or entrada["version_extractor"] != self.version_extractor:
+            return False
+        if entrada.get("pendiente_ocr") and self.ocr_disponible:
+            return False
+        estado = os.stat(path)
+        if estado.st_size != entrada["tamano"]:
+            return False
+        if estado.st_mtime == entrada["mtime"]:
+            return True
+        # Modificado según la fecha: comparar el contenido antes de reprocesarlo
+        self.hashes[path] = hash_archivo(path)
+        if self.hashes[path] != entrada["sha256"]:
+            return False
+        entrada["mtime"] = estado.st_mtime
+        return True
+
+    def hash_actual(self, path):
+        """Hash del contenido del archivo: el registrado si no cambió su tamaño ni su fecha, si no se calcula"""
+        entrada = self.archivos.get(path)
+        estado = os.stat(path)
+        if entrada is not None and estado.st_size == entrada["tamano"] and estado.st_mtime == entrada["mtime"]:
+            return entrada["sha256"]
+        if path not in self.hashes:
+            self.hashes[path] = hash_archivo(path)
+        return self.hashes[path]
+
+    def pendientes(self, paths, existe=None):
+        """Archivos nuevos o modificados; `existe(entrada)` indica si su entrada sigue en el JSON"""
+        return [
+            path for path in paths
+            if not self.sin_cambios(path) or (existe is not None and not existe(self.archivos[path]))
+        ]
+
+    def eliminados(self, directorio, paths):
+        """Entradas de archivos de `directorio` que ya no están entre `paths`"""
+        actuales = set(paths)
+        directorio = os.path.normpath(directorio)
+        return {
+            path: entrada for path, entrada in self.archivos.items()
+            if os.path.dirname(path) == directorio and path not in actuales
+        }
+
+    def registrar(self, path, categoria, clave, pendiente_ocr=False):
+        """Registrar un archivo procesado y la entrada (categoría y clave) que generó en el JSON;
+        `pendiente_ocr` indica que le quedaron páginas escaneadas sin reconocer"""
+        estado = os.stat(path)
+        self.archivos[path] = {
+            "tamano": estado.st_size,
+            "mtime": estado.st_mtime,
+            "sha256": self.hashes.pop(path, None) or hash_archivo(path),
+            "version_extractor": self.version_extractor,
+            "categoria": categoria,
+            "clave": clave,
+            "pendiente_ocr": pendiente_ocr,
+        }
+        self.cambios += 1
+
+    def quitar(self, path):
+        """Olvidar un archivo eliminado"""
+        if self.archivos.pop(path, None) is not None:
+            self.cambios += 1
@@ -0,0 +1,204 @@
+"""
+Clasificador local de consultas frecuentes
+Cada consulta se proyecta con n-gramas por hashing y se compara con el centroide de
+cada clase (respuestas predefinidas, preguntas frecuentes o "llm"); si la similitud
+es alta y clara (y la consulta niega lo mismo que la pregunta de la clase), el bot
+responde al instante sin llamar a Gemini.
+Se entrena al iniciar con bot_knowledge.json, FAQ de knowledge_base.py, las palabras
+clave de intent_router.py, las formas frecuentes de preguntar de FRASES y las consultas
+etiquetadas en consultas.jsonl
+"""
+
+import json
+import os
+
+import numpy as np
+
+from intent_router import INTENCIONES
+from knowledge_base import FAQ
+from semantic_cache import jaccard, negaciones, terminos_pregunta
+from semantic_search import HashingEmbedder
+
+KNOWLEDGE_FILE = "bot_knowledge.json"
+
+# Consultas registradas por el bot: {"texto", "prediccion", "confianza"}; las líneas a las
+# que se agrega "intencion" (una clase o "llm") se usan como ejemplos de entrenamiento
+CONSULTAS_FILE = "consultas.jsonl"
+
+# Clase de las consultas que tiene que responder Gemini
+LLM = "llm"
+DIMENSION = 1024
+
+# Similitud mínima (Jaccard de pregunta y respuesta) para considerar dos preguntas frecuentes
+# la misma con otras palabras; las distintas no pasan de 0.3
+UMBRAL_FUSION = 0.5
+
+# Formas frecuentes de preguntar por cada trámite con respuesta predefinida (requisitos, costo,
+# plazo), para que su centroide no quede dominado por el texto largo de la respuesta. Las de
+# "llm" preguntan por el contenido de un documento: las responde Gemini con los pasajes
+FRASES = {
+    "acta_nacimiento": [
+        "requisitos acta de nacimiento", "requisitos para sacar el acta de nacimiento",
+        "qué necesito para el acta de nacimiento", "cómo saco un acta de nacimiento",
+        "cuánto cuesta el acta de nacimiento", "cuánto tarda el acta de nacimiento",
+        "dónde solicito el acta de nacimiento", "acta de nacimiento para un menor",
+        "cómo declaro a mi hijo", "declaración tardía de nacimiento", "inscribir el nacimiento de mi hijo",
+        "mi hijo nació en el extranjero, cómo lo declaro", "declarar un hijo nacido fuera del país",
+        "quiero declarar a mi hijo", "mi bebé nació, cómo lo declaro", "declarar el nacimiento de mi hijo",
+        "registrar a mi hijo recién nacido",
+    ],
+    "cedula": [
+        "requisitos para sacar la cédula", "cuánto cuesta la cédula", "precio de la cédula",
+        "qué necesito para la cédula por primera vez", "cuánto tarda la cédula",
+        "perdí la cédula, qué hago", "me robaron la cédula",
+    ],
+    "cambio_nombre": [
+        "requisitos para cambiar de nombre", "cuánto cuesta un cambio de nombre",
+        "corrección de datos en el acta", "corregir un error en el acta", "corregir los datos del acta",
+        "mi acta tiene un dato equivocado", "rectificación de acta", "rectificar el apellido en el acta",
+        "error en los datos del acta de nacimiento", "corregir la fecha en el acta", "corregir mi nombre en el acta",
+        "cómo cambio mi apellido",
+    ],
+    "matrimonio": [
+        "requisitos para casarse", "cuánto cuesta casarse por lo civil", "documentos para el matrimonio civil",
+    ],
+    "divorcio": [
+        "requisitos para divorciarse", "cuánto cuesta un divorcio", "cómo me divorcio",
+    ],
+    "defuncion": [
+        "requisitos acta de defunción", "cómo declarar una defunción", "cuánto cuesta el acta de defunción",
+    ],
+    "naturalizacion": [
+        "requisitos para naturalizarse", "cómo obtener la nacionalidad dominicana", "cuánto cuesta naturalizarse",
+    ],
+    "apostilla": [
+        "cómo apostillar un acta", "cuánto cuesta la apostilla", "dónde se apostillan los documentos",
+    ],
+    "adopcion": [
+        "requisitos para adoptar", "cómo adoptar un niño", "cuánto tarda una adopción",
+    ],
+    "certificados": [
+        "cómo saco un certificado de soltería", "requisitos certificado de buena conducta",
+        "cuánto cuesta un certificado de residencia",
+    ],
+    LLM: [
+        "qué dice la resolución sobre", "qué establece la circular", "qué dice el reglamento",
+        "qué dice la ley sobre", "artículo de la ley", "instrucción de la junta sobre",
+        "según la resolución", "según la ley", "según el reglamento", "de acuerdo con la circular",
+    ],
+}
+
+
+def ejemplos_de_entrenamiento(respuestas_predefinidas, knowledge_file=KNOWLEDGE_FILE, consultas_file=CONSULTAS_FILE):
+    """Ejemplos (texto, clase), respuesta de cada clase y negaciones con que se formulan sus preguntas"""
+    ejemplos = []
+    respuestas = {}
+    formas = {}
+
+    # Respuestas predefinidas: las palabras clave de la intención y el texto de la respuesta
+    for intencion, palabras in INTENCIONES.items():
+        if intencion not in respuestas_predefinidas:
+            continue
+        respuestas[intencion] = respuestas_predefinidas[intencion]
+        formas[intencion] = {frozenset()}
+        claves = [palabra.rstrip("*") for palabra in palabras]
+        ejemplos.extend((clave, intencion) for clave in claves)
+        ejemplos.append((" ".join(claves), intencion))
+        ejemplos.append((respuestas_predefinidas[intencion], intencion))
+        ejemplos.extend((frase, intencion) for frase in FRASES.get(intencion, ()))
+    ejemplos.extend((frase, LLM) for frase in FRASES[LLM])
+
+    # Preguntas frecuentes: la pregunta y su respuesta. bot_knowledge.json repite con otras
+    # palabras las de knowledge_base.py: las equivalentes van a la misma clase, con la
+    # respuesta de bot_knowledge.json
+    preguntas = list(FAQ.items())
+    if os.path.exists(knowledge_file):
+        with open(knowledge_file, 'r', encoding='utf-8') as f:
+            for pregunta, datos in json.load(f).get("preguntas_frecuentes", {}).items():
+                preguntas.append((pregunta, datos["respuesta"] if isinstance(datos, dict) else datos))
+    terminos_clases = {}
+    for pregunta, respuesta in preguntas:
+        terminos = terminos_pregunta(f"{pregunta} {respuesta}")
+        clase = clase_equivalente(terminos, negaciones(pregunta), terminos_clases, formas) or f"faq:{pregunta}"
+        terminos_clases.setdefault(clase, terminos)
+        respuestas[clase] = respuesta
+        formas.setdefault(clase, set()).add(negaciones(pregunta))
+        ejemplos.append((pregunta, clase))
+        ejemplos.append((f"{pregunta} {respuesta}", clase))
+
+    # Consultas reales etiquetadas
+    if os.path.exists(consultas_file):
+        with open(consultas_file, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    consulta = json.loads(linea)
+                except ValueError:
+                    continue
+                clase = consulta.get("intencion")
+                if clase == LLM or clase in respuestas:
+                    ejemplos.append((consulta["texto"], clase))
+                    formas.setdefault(clase, set()).add(negaciones(consulta["texto"]))
+
+    return ejemplos, respuestas, formas
+
+
+def clase_equivalente(terminos, negacion, terminos_clases, formas):
+    """Clase de una pregunta frecuente ya agregada que pregunta lo mismo, o None"""
+    for clase, terminos_clase in terminos_clases.items():
+        if negacion in formas[clase] and jaccard(terminos, terminos_clase) >= UMBRAL_FUSION:
+            return clase
+    return None
+
+
+class IntentClassifier:
+    def __init__(self, clases, centroides, respuestas, formas, embedder, umbral=0.45, margen=0.1):
+        self.clases = clases
+        # Una fila normalizada por clase
+        self.centroides = centroides
+        self.respuestas = respuestas
+        # Clase -> negaciones con que se formulan sus preguntas ("si no tengo cédula" -> {"no"})
+        self.formas = formas
+        self.embedder = embedder
+        # Similitud mínima con la mejor clase y ventaja mínima sobre la segunda
+        self.umbral = umbral
+        self.margen = margen
+
+    def __len__(self):
+        return len(self.clases)
+
+    @classmethod
+    def entrenar(cls, ejemplos, respuestas, formas, embedder=None, **kwargs):
+        """Calcular el centroide de cada clase a partir de los ejemplos (texto, clase)"""
+        embedder = embedder or HashingEmbedder(DIMENSION, analizador=terminos_pregunta)
+        clases = sorted({clase for _, clase in ejemplos})
+        posicion = {clase: i for i, clase in enumerate(clases)}
+
+        vectores = embedder.embed([texto for texto, _ in ejemplos])
+        centroides = np.zeros((len(clases), embedder.dimension), dtype=np.float32)
+        np.add.at(centroides, [posicion[clase] for _, clase in ejemplos], vectores)
+        normas = np.linalg.norm(centroides, axis=1, keepdims=True)
+        centroides /= np.where(normas > 0, normas, 1)
+        return cls(clases, centroides, respuestas, formas, embedder, **kwargs)
+
+    def clasificar(self, texto):
+        """Clase más probable y su similitud; LLM si no hay una clase clara o la consulta niega otra cosa"""
+        if not self.clases:
+            return LLM, 0.0
+        similitudes = self.centroides @ self.embedder.embed_one(texto)
+        orden = np.argsort(similitudes)[::-1][:2]
+        mejor = float(similitudes[orden[0]])
+        segunda = float(similitudes[orden[1]]) if len(orden) > 1 else 0.0
+        clase = self.clases[orden[0]]
+        if clase == LLM or mejor < self.umbral or mejor - segunda < self.margen:
+            return LLM, mejor
+        # "si tengo cédula" no es la pregunta "si no tengo cédula" aunque se parezcan
+        if negaciones(texto) not in self.formas.get(clase, ()):
+            return LLM, mejor
+        return clase, mejor
+
+
+def registrar_consulta(texto, prediccion, confianza, consultas_file=CONSULTAS_FILE):
+    """Agregar una consulta al registro para etiquetarla y reentrenar el clasificador"""
+    with open(consultas_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"texto": texto, "prediccion": prediccion, "confianza": round(confianza, 3)},
+                           ensure_ascii=False) + "\n")
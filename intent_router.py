@@ -0,0 +1,94 @@
+"""
+Clasificador de intenciones para las respuestas predefinidas
+Las palabras clave de todas las intenciones se compilan en una sola expresión regular
+(sin tildes y por palabras completas) y cada una suma su peso a su intención; gana la
+intención con mayor puntaje, y ante un empate la que aparece primero en INTENCIONES
+"""
+
+import re
+
+from retrieval import quitar_acentos
+
+# Intención -> palabra clave -> peso. Una palabra terminada en "*" acepta cualquier
+# terminación (adopt* = adoptar, adoptado...); las demás aceptan el plural
+INTENCIONES = {
+    "acta_nacimiento": {
+        "acta": 1, "nacimiento": 2, "partida": 2, "inextensa": 2, "declaracion tardia": 2,
+    },
+    "cambio_nombre": {
+        "cambio": 1, "cambiar": 1, "nombre": 1, "modificar": 1, "corregir": 2, "correccion": 2,
+        "apellido": 2, "rectificar": 2, "rectificacion": 2,
+    },
+    "naturalizacion": {
+        "naturaliz*": 3, "nacionalidad": 2, "ciudadania": 2, "extranjero": 1, "inmigrante": 2,
+    },
+    "apostilla": {
+        "apostill*": 3, "legaliz*": 2, "internacional": 1, "extranjero": 1, "validar": 1,
+    },
+    "cedula": {
+        "cedula": 3, "identidad": 2, "carnet": 2, "documento": 1,
+    },
+    "matrimonio": {
+        "matrimonio": 3, "casarse": 3, "casarnos": 3, "casarme": 3, "boda": 3, "casamiento": 3,
+    },
+    "divorcio": {
+        "divorci*": 3, "separar": 2, "separacion": 2, "disolver": 2, "disolucion": 2,
+    },
+    "adopcion": {
+        "adop*": 3, "hijo": 1, "menor": 1,
+    },
+    "defuncion": {
+        "defuncion": 3, "muerte": 2, "fallec*": 3,
+    },
+    "certificados": {
+        "certificado": 2, "certificacion": 2, "buena conducta": 3, "solteria": 3, "residencia": 2,
+        "nacionalidad": 1,
+    },
+}
+
+INTENCION_POR_DEFECTO = "general"
+
+
+class IntentRouter:
+    def __init__(self, intenciones=INTENCIONES, por_defecto=INTENCION_POR_DEFECTO):
+        self.intenciones = list(intenciones)
+        self.por_defecto = por_defecto
+        # Palabra clave -> [(posición de la intención, peso)], para las que están en varias intenciones
+        self.pesos = {}
+        for posicion, (intencion, palabras) in enumerate(intenciones.items()):
+            for palabra, peso in palabras.items():
+                self.pesos.setdefault(palabra, []).append((posicion, peso))
+
+        # Una sola alternancia, las palabras más largas primero, con un grupo con nombre por palabra.
+        # Las alternativas se agrupan por su primera letra para que el motor descarte
+        # enseguida las posiciones que no pueden empezar ninguna palabra clave
+        self.palabras = sorted(self.pesos, key=len, reverse=True)
+        por_letra = {}
+        for indice, palabra in enumerate(self.palabras):
+            if palabra.endswith("*"):
+                resto = re.escape(palabra[1:-1]) + r"\w*"
+            else:
+                resto = re.escape(palabra[1:]).replace(r"\ ", r"\s+") + r"(?:es|s)?"
+            por_letra.setdefault(palabra[0], []).append(f"(?P<p{indice}>{resto})")
+        alternativas = [f"{re.escape(letra)}(?:{'|'.join(restos)})" for letra, restos in por_letra.items()]
+        self.patron = re.compile(r"\b(?:" + "|".join(alternativas) + r")\b")
+
+    def puntajes(self, texto):
+        """Puntaje de cada intención; cada palabra clave cuenta una sola vez"""
+        texto = texto.lower()
+        if not texto.isascii():
+            texto = quitar_acentos(texto)
+        encontradas = {int(m.lastgroup[1:]) for m in self.patron.finditer(texto)}
+        puntajes = [0] * len(self.intenciones)
+        for indice in encontradas:
+            for posicion, peso in self.pesos[self.palabras[indice]]:
+                puntajes[posicion] += peso
+        return puntajes
+
+    def clasificar(self, texto):
+        """Intención con mayor puntaje y su puntaje (la intención por defecto si no hay ninguna)"""
+        puntajes = self.puntajes(texto)
+        mejor = max(range(len(puntajes)), key=lambda posicion: (puntajes[posicion], -posicion), default=None)
+        if mejor is None or puntajes[mejor] == 0:
+            return self.por_defecto, 0
+        return self.intenciones[mejor], puntajes[mejor]
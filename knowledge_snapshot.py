@@ -0,0 +1,209 @@
+"""
+Snapshot binario de la base de conocimiento JCE
+Reúne documentos, resoluciones y el índice BM25 en un solo archivo:
+los metadatos y el vocabulario se leen al inicio, mientras que el contenido de
+los documentos y los vectores del índice quedan en un bloque mapeado en memoria
+que se lee bajo demanda y que comparten todos los procesos del bot en el mismo equipo
+"""
+
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+
+import numpy as np
+
+from passages import load_categorized
+from retrieval import BM25Retriever, build_retriever
+
+SNAPSHOT_FILE = "jce_knowledge.snap"
+SOURCE_FILES = ("jce_documents.json", "jce_resolutions.json")
+MAGIC = b"JCESNAP1"
+FORMAT_VERSION = 1
+
+# Cabecera: firma + longitud del encabezado JSON (entero sin signo de 8 bytes)
+PREAMBLE = struct.Struct("<8sQ")
+ALINEACION = 8
+
+
+class SnapshotDocument(Mapping):
+    """Documento cuyo contenido se lee del snapshot solo cuando se pide"""
+
+    __slots__ = ("_datos", "_meta", "_contenido")
+
+    def __init__(self, datos, meta, contenido):
+        self._datos = datos
+        self._meta = meta
+        self._contenido = contenido
+
+    def __getitem__(self, key):
+        if key == "contenido":
+            inicio, longitud = self._contenido
+            return str(self._datos[inicio:inicio + longitud], "utf-8")
+        return self._meta[key]
+
+    def __iter__(self):
+        yield from self._meta
+        yield "contenido"
+
+    def __len__(self):
+        return len(self._meta) + 1
+
+
+def estado_fuentes(source_files=SOURCE_FILES):
+    """Tamaño y fecha de modificación de los archivos de origen"""
+    return {
+        path: [os.path.getsize(path), os.path.getmtime(path)] if os.path.exists(path) else None
+        for path in source_files
+    }
+
+
+class KnowledgeSnapshot:
+    def __init__(self, documentos, resoluciones, retriever, datos=None, fuentes=None):
+        self.documentos = documentos
+        self.resoluciones = resoluciones
+        self.retriever = retriever
+        # Archivo mapeado en memoria del que se leen los contenidos
+        self.datos = datos
+        # Estado de los archivos de origen al compilar el snapshot
+        self.fuentes = fuentes or {}
+
+    @staticmethod
+    def write(documentos, resoluciones, path=SNAPSHOT_FILE, fuentes=None):
+        """Compilar documentos y resoluciones en un snapshot"""
+        retriever = build_retriever(documentos, resoluciones)
+        bloque = bytearray()
+
+        def agregar(datos):
+            # Alinear cada sección para poder leer los vectores sin copiarlos
+            bloque.extend(b"\0" * (-len(bloque) % ALINEACION))
+            inicio = len(bloque)
+            bloque.extend(datos)
+            return [inicio, len(datos)]
+
+        def compilar(coleccion):
+            compilados = {}
+            for doc_id, documento in coleccion.items():
+                meta = {key: value for key, value in documento.items() if key != "contenido"}
+                meta["_contenido"] = agregar(documento.get("contenido", "").encode("utf-8"))
+                compilados[doc_id] = meta
+            return compilados
+
+        encabezado = {
+            "version": FORMAT_VERSION,
+            "fuentes": fuentes if fuentes is not None else estado_fuentes(),
+            "documentos": compilar(documentos),
+            "resoluciones": compilar(resoluciones),
+        }
+
+        terminos, posiciones, puntajes = retriever.exportar()
+        encabezado["indice"] = {
+            # El artículo se guarda por posición y se recupera de los metadatos al cargar
+            "unidades": [list(unidad) for unidad in retriever.orden],
+            "terminos": terminos,
+            "posiciones": agregar(posiciones.astype("<i4").tobytes()),
+            "puntajes": agregar(puntajes.astype("<f4").tobytes()),
+        }
+
+        codificado = json.dumps(encabezado, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        codificado += b" " * (-(PREAMBLE.size + len(codificado)) % ALINEACION)
+
+        temporal = f"{path}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(PREAMBLE.pack(MAGIC, len(codificado)))
+            f.write(codificado)
+            f.write(bloque)
+        # Reemplazo atómico para no romper a los procesos que tienen el snapshot abierto
+        os.replace(temporal, path)
+        print(f"✅ Snapshot de conocimiento guardado en {path}")
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_FILE):
+        """Abrir un snapshot; el contenido y los vectores del índice quedan mapeados en memoria"""
+        with open(path, 'rb') as f:
+            datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, longitud = PREAMBLE.unpack_from(datos, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es un snapshot de conocimiento")
+
+        encabezado = json.loads(datos[PREAMBLE.size:PREAMBLE.size + longitud])
+        if encabezado.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Versión de snapshot no soportada: {encabezado.get('version')}")
+
+        base = PREAMBLE.size + longitud
+        bloque = memoryview(datos)[base:]
+
+        def cargar(compilados):
+            return {
+                doc_id: SnapshotDocument(bloque, meta, meta.pop("_contenido"))
+                for doc_id, meta in compilados.items()
+            }
+
+        documentos = cargar(encabezado["documentos"])
+        resoluciones = cargar(encabezado["resoluciones"])
+
+        indice = encabezado["indice"]
+        inicio, longitud = indice["posiciones"]
+        posiciones = np.frombuffer(bloque, dtype="<i4", count=longitud // 4, offset=inicio)
+        inicio, longitud = indice["puntajes"]
+        puntajes = np.frombuffer(bloque, dtype="<f4", count=longitud // 4, offset=inicio)
+
+        unidades = []
+        for fuente, doc_id, posicion in indice["unidades"]:
+            articulo = None
+            if posicion is not None:
+                if fuente == "documento":
+                    articulo = documentos[doc_id]["informacion"]["articulos"][posicion]
+                else:
+                    articulo = resoluciones[doc_id]["contenido_procesado"]["articulos"][posicion]
+            unidades.append(((fuente, doc_id, posicion), fuente, doc_id, articulo))
+
+        retriever = BM25Retriever.from_exported(unidades, indice["terminos"], posiciones, puntajes)
+        return cls(documentos, resoluciones, retriever, datos, encabezado.get("fuentes"))
+
+    def vigente(self, source_files=SOURCE_FILES):
+        """Indicar si el snapshot corresponde a los archivos de origen actuales"""
+        actuales = estado_fuentes(source_files)
+        return all(self.fuentes.get(path) == estado for path, estado in actuales.items())
+
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """Abrir el snapshot si existe y está al día; None para usar los archivos JSON"""
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = KnowledgeSnapshot.load(path)
+    except Exception as e:
+        print(f"Error cargando snapshot: {e}")
+        return None
+
+    if not snapshot.vigente():
+        print("⚠️ El snapshot está desactualizado, se usarán los archivos JSON (ejecuta knowledge_snapshot.py)")
+        return None
+    return snapshot
+
+
+def build_snapshot(documents_file="jce_documents.json", resolutions_file="jce_resolutions.json", path=SNAPSHOT_FILE):
+    """Compilar el snapshot a partir de los archivos JSON de documentos y resoluciones"""
+    KnowledgeSnapshot.write(
+        load_categorized(documents_file),
+        load_categorized(resolutions_file),
+        path,
+        estado_fuentes((documents_file, resolutions_file))
+    )
+
+
+def main():
+    """Función principal"""
+    print("📦 Compilador del Snapshot de Conocimiento JCE")
+    print("=" * 40)
+    build_snapshot()
+    snapshot = KnowledgeSnapshot.load()
+    print(f"\n🎉 {len(snapshot.documentos)} documentos, {len(snapshot.resoluciones)} resoluciones, "
+          f"{len(snapshot.retriever)} unidades indexadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Proveedores de modelos de lenguaje para el bot
+Todos exponen la misma interfaz asíncrona (generar y generar_stream), de modo que el
+bot puede usar Gemini o un modelo simulado local para pruebas de carga sin conexión.
+El proveedor se elige con LLM_PROVIDER: "gemini" (por defecto) o "stub"
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+
+import google.generativeai as genai
+
+
+class LLMProvider:
+    """Interfaz común de los proveedores"""
+
+    nombre = "base"
+
+    async def generar(self, prompt):
+        """Generar la respuesta completa a un prompt"""
+        raise NotImplementedError
+
+    async def generar_stream(self, prompt):
+        """Generar la respuesta en fragmentos a medida que están disponibles"""
+        yield await self.generar(prompt)
+
+
+class GeminiProvider(LLMProvider):
+    def __init__(self, api_key=None, modelo="gemini-1.5-flash"):
+        # El cliente asíncrono abre un único canal gRPC que comparten todas las llamadas
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(modelo)
+        self.nombre = f"gemini:{modelo}"
+
+    async def generar(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    async def generar_stream(self, prompt):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+
+# Vocabulario de las respuestas simuladas
+PALABRAS_STUB = (
+    "acta", "nacimiento", "cédula", "resolución", "artículo", "oficialía", "registro",
+    "civil", "declaración", "requisitos", "solicitud", "junta", "central", "electoral",
+)
+
+
+class StubError(Exception):
+    """Error simulado por StubProvider"""
+
+
+class StubProvider(LLMProvider):
+    """Modelo local determinista con latencia, tasa de error y velocidad de generación configurables"""
+
+    def __init__(self, latencia=0.5, tasa_error=0.0, tokens_por_segundo=50.0, tokens=80, semilla=0):
+        self.latencia = latencia
+        self.tasa_error = tasa_error
+        self.tokens_por_segundo = tokens_por_segundo
+        self.tokens = tokens
+        self.azar = random.Random(semilla)
+        self.nombre = f"stub:{latencia * 1000:.0f}ms"
+
+    def _respuesta(self, prompt):
+        """Texto fijo para cada prompt, derivado de su hash"""
+        azar = random.Random(hashlib.sha1(prompt.encode("utf-8")).digest())
+        return "Respuesta simulada: " + " ".join(azar.choice(PALABRAS_STUB) for _ in range(self.tokens))
+
+    async def _esperar_latencia(self):
+        await asyncio.sleep(self.latencia)
+        if self.tasa_error and self.azar.random() < self.tasa_error:
+            raise StubError("Error simulado del modelo")
+
+    async def generar(self, prompt):
+        await self._esperar_latencia()
+        await asyncio.sleep(self.tokens / self.tokens_por_segundo)
+        return self._respuesta(prompt)
+
+    async def generar_stream(self, prompt):
+        await self._esperar_latencia()
+        palabras = self._respuesta(prompt).split(" ")
+        # Fragmentos de unas 8 palabras, al ritmo de tokens_por_segundo
+        for i in range(0, len(palabras), 8):
+            await asyncio.sleep(len(palabras[i:i + 8]) / self.tokens_por_segundo)
+            yield " ".join(palabras[i:i + 8]) + " "
+
+
+def create_provider():
+    """Crear el proveedor configurado en las variables de entorno"""
+    proveedor = os.getenv("LLM_PROVIDER", "gemini").lower()
+    if proveedor == "stub":
+        return StubProvider(
+            latencia=float(os.getenv("STUB_LATENCIA", "0.5")),
+            tasa_error=float(os.getenv("STUB_TASA_ERROR", "0")),
+            tokens_por_segundo=float(os.getenv("STUB_TOKENS_POR_SEGUNDO", "50")),
+        )
+    if proveedor != "gemini":
+        raise ValueError(f"Proveedor de LLM desconocido: {proveedor}")
+    return GeminiProvider(os.getenv("GEMINI_API_KEY"), os.getenv("LLM_MODELO", "gemini-1.5-flash"))
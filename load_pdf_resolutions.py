@@ -3,21 +3,32 @@ Script para cargar resoluciones desde archivos PDF
 Requiere: pip install PyPDF2
 """
 
+import argparse
 import json
 import os
 from datetime import datetime
 from pathlib import Path
 
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
+from extraction import informacion_resolucion
+from ingest_manifest import IngestManifest
+from knowledge_snapshot import build_snapshot
+from ocr import completar_paginas, ocr_disponible, pendiente_ocr
+from passages import build_passage_store
+from semantic_search import actualizar_embeddings
+from pdf_extraction import PDF_AVAILABLE, iter_pdf_pages, unir_paginas
+
+if not PDF_AVAILABLE:
     print("⚠️ PyPDF2 no está instalado. Para cargar PDFs, ejecuta: pip install PyPDF2")
 
+# Versión de la extracción: al cambiarla se vuelven a cargar todos los PDF
+EXTRACTOR_VERSION = 1
+
 class PDFResolutionLoader:
     def __init__(self):
         self.resolutions_file = "jce_resolutions.json"
+        self.manifest = IngestManifest("resoluciones_pdf", EXTRACTOR_VERSION, ocr_disponible=ocr_disponible())
+        # PDFs a los que les quedaron páginas escaneadas sin reconocer
+        self.pendientes_ocr = set()
         self.load_resolutions()
     
     def load_resolutions(self):
@@ -39,29 +50,26 @@ class PDFResolutionLoader:
         self.resolutions["fecha_actualizacion"] = datetime.now().isoformat()
         with open(self.resolutions_file, 'w', encoding='utf-8') as f:
             json.dump(self.resolutions, f, ensure_ascii=False, indent=2)
+        self.manifest.save()
         print(f"✅ Resoluciones guardadas en {self.resolutions_file}")
     
-    def extract_text_from_pdf(self, pdf_path):
-        """Extraer texto de un archivo PDF"""
+    def extract_text_from_pdf(self, pdf_path, jobs=1):
+        """Extraer texto de un archivo PDF; sus páginas escaneadas se reconocen con OCR en
+        `jobs` procesos"""
         if not PDF_AVAILABLE:
             print("❌ PyPDF2 no está disponible")
             return None
         
         try:
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n"
-            
-            return text
+            paginas = completar_paginas({pdf_path: list(iter_pdf_pages(pdf_path))}, jobs)[pdf_path]
         except Exception as e:
             print(f"❌ Error extrayendo texto de {pdf_path}: {e}")
             return None
+        if pendiente_ocr(paginas):
+            self.pendientes_ocr.add(pdf_path)
+        return unir_paginas(paginas)
     
-    def load_pdf_resolution(self, pdf_path, category="resolucion"):
+    def load_pdf_resolution(self, pdf_path, category="resolucion", jobs=1):
         """Cargar resolución desde archivo PDF"""
         if not PDF_AVAILABLE:
             print("❌ PyPDF2 no está disponible. Instala con: pip install PyPDF2")
@@ -69,7 +77,7 @@ class PDFResolutionLoader:
         
         try:
             # Extraer texto del PDF
-            content = self.extract_text_from_pdf(pdf_path)
+            content = self.extract_text_from_pdf(pdf_path, jobs)
             if not content:
                 return False
             
@@ -102,142 +110,51 @@ class PDFResolutionLoader:
     
     def process_resolution_content(self, content, title):
         """Procesar contenido de resolución (mismo que en load_resolutions.py)"""
-        import re
-        
-        processed = {
-            "titulo": title,
-            "numero_resolucion": self.extract_resolution_number(content),
-            "fecha": self.extract_date(content),
-            "articulos": self.extract_articles(content),
-            "disposiciones": self.extract_dispositions(content),
-            "aplicacion": self.extract_application(content),
-            "sanciones": self.extract_sanctions(content),
-            "contactos": self.extract_contacts(content)
-        }
-        return processed
-    
-    def extract_resolution_number(self, content):
-        """Extraer número de resolución"""
-        import re
-        patterns = [
-            r'Resolución\s+No\.?\s*(\d+)',
-            r'Resolución\s+(\d+)',
-            r'No\.?\s*(\d+)',
-            r'Res\.\s*(\d+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        return "No especificado"
-    
-    def extract_date(self, content):
-        """Extraer fecha de la resolución"""
-        import re
-        patterns = [
-            r'(\d{1,2}/\d{1,2}/\d{4})',
-            r'(\d{1,2}-\d{1,2}-\d{4})',
-            r'(\d{1,2}\s+de\s+\w+\s+de\s+\d{4})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content)
-            if match:
-                return match.group(1)
-        return "No especificada"
-    
-    def extract_articles(self, content):
-        """Extraer artículos de la resolución"""
-        import re
-        articles = []
-        pattern = r'Artículo\s+(\d+)\.?\s*([^.]*\.)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        
-        for match in matches:
-            articles.append({
-                "numero": match[0],
-                "contenido": match[1].strip()
-            })
-        
-        return articles
-    
-    def extract_dispositions(self, content):
-        """Extraer disposiciones"""
-        import re
-        dispositions = []
-        pattern = r'Disposición\s+(\w+)\.?\s*([^.]*\.)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        
-        for match in matches:
-            dispositions.append({
-                "tipo": match[0],
-                "contenido": match[1].strip()
-            })
-        
-        return dispositions
+        return informacion_resolucion(content, title)
     
-    def extract_application(self, content):
-        """Extraer información sobre aplicación"""
-        import re
-        application_info = []
-        
-        sections = [
-            "aplicación", "vigencia", "entrada en vigor", 
-            "alcance", "ámbito de aplicación"
-        ]
-        
-        for section in sections:
-            pattern = rf'{section}[^.]*\.'
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            application_info.extend(matches)
-        
-        return application_info
-    
-    def extract_sanctions(self, content):
-        """Extraer información sobre sanciones"""
-        import re
-        sanctions = []
-        pattern = r'sanción[^.]*\.'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        sanctions.extend(matches)
-        return sanctions
-    
-    def extract_contacts(self, content):
-        """Extraer información de contacto"""
-        import re
-        contacts = []
-        
-        # Buscar teléfonos
-        phone_pattern = r'\(\d{3}\)\s*\d{3}-\d{4}'
-        phones = re.findall(phone_pattern, content)
-        contacts.extend([{"tipo": "telefono", "valor": phone} for phone in phones])
-        
-        # Buscar emails
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, content)
-        contacts.extend([{"tipo": "email", "valor": email} for email in emails])
-        
-        return contacts
+    def resolution_exists(self, entrada):
+        """Indicar si la entrada de un archivo del manifiesto sigue en las resoluciones"""
+        return entrada["clave"] in self.resolutions.get(entrada["categoria"], {})
     
-    def load_from_directory(self, directory_path, category="resolucion"):
-        """Cargar todos los PDFs de un directorio"""
+    def load_from_directory(self, directory_path, category="resolucion", incremental=True, jobs=1):
+        """Cargar los PDFs de un directorio; en modo incremental solo los nuevos o modificados
+        desde la última ejecución, y quitar los que se eliminaron. Las páginas escaneadas se
+        reconocen en `jobs` procesos"""
         if not os.path.exists(directory_path):
             print(f"❌ Directorio no encontrado: {directory_path}")
             return False
         
-        loaded_count = 0
-        for filename in os.listdir(directory_path):
-            if filename.endswith('.pdf'):
-                file_path = os.path.join(directory_path, filename)
-                if self.load_pdf_resolution(file_path, category):
-                    loaded_count += 1
+        pdf_paths = [
+            os.path.join(directory_path, filename)
+            for filename in sorted(os.listdir(directory_path))
+            if filename.endswith('.pdf')
+        ]
+        for file_path, entrada in self.manifest.eliminados(directory_path, pdf_paths).items():
+            self.resolutions.get(entrada["categoria"], {}).pop(entrada["clave"], None)
+            self.manifest.quitar(file_path)
+            print(f"🗑️ Resolución '{entrada['clave']}' eliminada: {file_path} ya no existe")
         
-        print(f"✅ {loaded_count} resoluciones PDF cargadas desde {directory_path}")
+        pendientes = self.manifest.pendientes(pdf_paths, self.resolution_exists) if incremental else pdf_paths
+        loaded_count = 0
+        for file_path in pendientes:
+            if self.load_pdf_resolution(file_path, category, jobs):
+                self.manifest.registrar(file_path, category, os.path.basename(file_path).replace('.pdf', ''),
+                                        pendiente_ocr=file_path in self.pendientes_ocr)
+                loaded_count += 1
+        
+        print(f"✅ {loaded_count} resoluciones PDF cargadas desde {directory_path} "
+              f"({len(pdf_paths) - len(pendientes)} sin cambios)")
         return loaded_count
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Cargar resoluciones de la JCE desde archivos PDF")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para el OCR de las páginas escaneadas (por defecto, uno por núcleo)")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Volver a cargar todos los PDFs aunque no hayan cambiado")
+    args = parser.parse_args()
+    
     if not PDF_AVAILABLE:
         print("❌ PyPDF2 no está instalado")
         print("💡 Para instalar: pip install PyPDF2")
@@ -254,11 +171,20 @@ def main():
     
     # Cargar PDFs existentes
     if pdf_dir.exists():
-        loader.load_from_directory(str(pdf_dir), "resolucion")
+        loader.load_from_directory(str(pdf_dir), "resolucion", incremental=not args.forzar, jobs=args.jobs)
+    
+    if not loader.manifest.cambios:
+        loader.manifest.save()
+        print("\n✅ No hay resoluciones PDF nuevas, modificadas ni eliminadas")
+        return
     
     # Guardar resoluciones
     loader.save_resolutions()
     
+    # Regenerar los pasajes, sus embeddings y el snapshot que usa el bot
+    actualizar_embeddings(build_passage_store(jobs=args.jobs))
+    build_snapshot()
+    
     print("\n🎉 Proceso completado!")
     print("📊 Para agregar PDFs:")
     print("   1. Coloca los archivos PDF en la carpeta 'resoluciones_pdf'")
@@ -3,15 +3,25 @@ Sistema para cargar resoluciones oficiales de la JCE
 Permite procesar PDFs y documentos de texto para entrenar el bot
 """
 
+import argparse
 import json
 import os
-import re
 from datetime import datetime
 from pathlib import Path
 
+from extraction import informacion_resolucion
+from ingest_manifest import IngestManifest
+from knowledge_snapshot import build_snapshot
+from passages import build_passage_store
+from semantic_search import actualizar_embeddings
+
+# Versión del procesamiento: al cambiarla se vuelven a cargar todos los archivos
+EXTRACTOR_VERSION = 1
+
 class ResolutionLoader:
     def __init__(self):
         self.resolutions_file = "jce_resolutions.json"
+        self.manifest = IngestManifest("resoluciones", EXTRACTOR_VERSION)
         self.load_resolutions()
     
     def load_resolutions(self):
@@ -33,6 +43,7 @@ class ResolutionLoader:
         self.resolutions["fecha_actualizacion"] = datetime.now().isoformat()
         with open(self.resolutions_file, 'w', encoding='utf-8') as f:
             json.dump(self.resolutions, f, ensure_ascii=False, indent=2)
+        self.manifest.save()
         print(f"✅ Resoluciones guardadas en {self.resolutions_file}")
     
     def load_text_resolution(self, file_path, category="resolucion"):
@@ -67,117 +78,34 @@ class ResolutionLoader:
             print(f"❌ Error al cargar {file_path}: {e}")
             return False
     
-    def process_resolution_content(self, content, title):
-        """Procesar contenido de resolución para extraer información útil"""
-        processed = {
-            "titulo": title,
-            "numero_resolucion": self.extract_resolution_number(content),
-            "fecha": self.extract_date(content),
-            "articulos": self.extract_articles(content),
-            "disposiciones": self.extract_dispositions(content),
-            "aplicacion": self.extract_application(content),
-            "sanciones": self.extract_sanctions(content),
-            "contactos": self.extract_contacts(content)
-        }
-        return processed
-    
-    def extract_resolution_number(self, content):
-        """Extraer número de resolución"""
-        patterns = [
-            r'Resolución\s+No\.?\s*(\d+)',
-            r'Resolución\s+(\d+)',
-            r'No\.?\s*(\d+)',
-            r'Res\.\s*(\d+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        return "No especificado"
-    
-    def extract_date(self, content):
-        """Extraer fecha de la resolución"""
-        patterns = [
-            r'(\d{1,2}/\d{1,2}/\d{4})',
-            r'(\d{1,2}-\d{1,2}-\d{4})',
-            r'(\d{1,2}\s+de\s+\w+\s+de\s+\d{4})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content)
-            if match:
-                return match.group(1)
-        return "No especificada"
-    
-    def extract_articles(self, content):
-        """Extraer artículos de la resolución"""
-        articles = []
-        pattern = r'Artículo\s+(\d+)\.?\s*([^.]*\.)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        
-        for match in matches:
-            articles.append({
-                "numero": match[0],
-                "contenido": match[1].strip()
-            })
-        
-        return articles
-    
-    def extract_dispositions(self, content):
-        """Extraer disposiciones"""
-        dispositions = []
-        pattern = r'Disposición\s+(\w+)\.?\s*([^.]*\.)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        
-        for match in matches:
-            dispositions.append({
-                "tipo": match[0],
-                "contenido": match[1].strip()
-            })
-        
-        return dispositions
+    def resolution_exists(self, entrada):
+        """Indicar si la entrada de un archivo del manifiesto sigue en las resoluciones"""
+        return entrada["clave"] in self.resolutions.get(entrada["categoria"], {})
     
-    def extract_application(self, content):
-        """Extraer información sobre aplicación"""
-        application_info = []
-        
-        # Buscar secciones relacionadas con aplicación
-        sections = [
-            "aplicación", "vigencia", "entrada en vigor", 
-            "alcance", "ámbito de aplicación"
-        ]
+    def load_from_directory(self, directory_path, category="resolucion", incremental=True):
+        """Cargar los archivos de texto de un directorio; en modo incremental solo los nuevos o
+        modificados desde la última ejecución, y quitar los que se eliminaron"""
+        file_paths = [str(file_path) for file_path in sorted(Path(directory_path).glob("*.txt"))]
+        for file_path, entrada in self.manifest.eliminados(directory_path, file_paths).items():
+            self.resolutions.get(entrada["categoria"], {}).pop(entrada["clave"], None)
+            self.manifest.quitar(file_path)
+            print(f"🗑️ Resolución '{entrada['clave']}' eliminada: {file_path} ya no existe")
         
-        for section in sections:
-            pattern = rf'{section}[^.]*\.'
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            application_info.extend(matches)
+        pendientes = self.manifest.pendientes(file_paths, self.resolution_exists) if incremental else file_paths
+        loaded_count = 0
+        for file_path in pendientes:
+            if self.load_text_resolution(file_path, category):
+                title = os.path.basename(file_path).replace('.txt', '').replace('.md', '')
+                self.manifest.registrar(file_path, category, title)
+                loaded_count += 1
         
-        return application_info
+        print(f"✅ {loaded_count} resoluciones cargadas desde {directory_path} "
+              f"({len(file_paths) - len(pendientes)} sin cambios)")
+        return loaded_count
     
-    def extract_sanctions(self, content):
-        """Extraer información sobre sanciones"""
-        sanctions = []
-        pattern = r'sanción[^.]*\.'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        sanctions.extend(matches)
-        return sanctions
-    
-    def extract_contacts(self, content):
-        """Extraer información de contacto"""
-        contacts = []
-        
-        # Buscar teléfonos
-        phone_pattern = r'\(\d{3}\)\s*\d{3}-\d{4}'
-        phones = re.findall(phone_pattern, content)
-        contacts.extend([{"tipo": "telefono", "valor": phone} for phone in phones])
-        
-        # Buscar emails
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, content)
-        contacts.extend([{"tipo": "email", "valor": email} for email in emails])
-        
-        return contacts
+    def process_resolution_content(self, content, title):
+        """Procesar contenido de resolución para extraer información útil"""
+        return informacion_resolucion(content, title)
     
     def create_bot_responses_from_resolutions(self):
         """Crear respuestas del bot basadas en las resoluciones"""
@@ -268,6 +196,11 @@ class ResolutionLoader:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Cargar resoluciones de la JCE desde archivos de texto")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Volver a cargar todos los archivos aunque no hayan cambiado")
+    args = parser.parse_args()
+    
     loader = ResolutionLoader()
     
     print("📋 Cargador de Resoluciones JCE")
@@ -279,8 +212,12 @@ def main():
     
     # Cargar resoluciones existentes
     if resolutions_dir.exists():
-        for file_path in resolutions_dir.glob("*.txt"):
-            loader.load_text_resolution(str(file_path), "resolucion")
+        loader.load_from_directory(str(resolutions_dir), "resolucion", incremental=not args.forzar)
+    
+    if not loader.manifest.cambios:
+        loader.manifest.save()
+        print("\n✅ No hay resoluciones nuevas, modificadas ni eliminadas")
+        return
     
     # Generar respuestas del bot
     bot_responses = loader.create_bot_responses_from_resolutions()
@@ -302,6 +239,10 @@ def main():
     # Guardar resoluciones
     loader.save_resolutions()
     
+    # Regenerar los pasajes, sus embeddings y el snapshot que usa el bot
+    actualizar_embeddings(build_passage_store())
+    build_snapshot()
+    
     print("\n🎉 Proceso completado!")
     print("📊 Estadísticas:")
     for category, resolutions in loader.resolutions.items():
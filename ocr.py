@@ -0,0 +1,166 @@
+"""
+Reconocimiento óptico (OCR) de las páginas escaneadas de los PDF
+Las páginas sin capa de texto (PyPDF2 no extrae nada) se convierten en imagen y se
+pasan por Tesseract. El reconocimiento es una etapa aparte de la extracción: cuando se
+terminan de extraer las páginas de un documento, las pendientes se reparten entre los
+procesos del pool de la ingesta.
+El texto reconocido se guarda en ocr_cache/ con la huella de la página, así que una
+página que no cambió nunca se vuelve a reconocer.
+Requiere: pip install pytesseract PyMuPDF (o pdf2image) y el programa tesseract con
+el idioma español
+"""
+
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+# Para convertir la página en imagen se prefiere PyMuPDF, que no necesita poppler
+try:
+    import fitz
+    from PIL import Image
+    RASTERIZADOR = "pymupdf"
+except ImportError:
+    try:
+        from pdf2image import convert_from_path
+        RASTERIZADOR = "pdf2image"
+    except ImportError:
+        RASTERIZADOR = None
+
+OCR_CACHE_DIR = "ocr_cache"
+OCR_IDIOMA = "spa"
+OCR_DPI = 300
+
+_disponible = None
+# Para avisar una sola vez que hay páginas escaneadas y el OCR no está instalado
+_aviso_mostrado = False
+
+
+def ocr_disponible():
+    """Indicar si están instalados pytesseract, un rasterizador y el programa tesseract"""
+    global _disponible
+    if _disponible is None:
+        _disponible = False
+        if TESSERACT_AVAILABLE and RASTERIZADOR:
+            try:
+                pytesseract.get_tesseract_version()
+                _disponible = True
+            except Exception:
+                pass
+    return _disponible
+
+
+def huella_pagina(page):
+    """Hash del contenido de una página de PyPDF2 y de las imágenes que dibuja; lanza la
+    excepción de PyPDF2 si no puede decodificar alguna imagen (por ejemplo, JBIG2)"""
+    sha256 = hashlib.sha256()
+    contenido = page.get_contents()
+    if contenido is not None:
+        sha256.update(contenido.get_data())
+    recursos = page.get("/Resources")
+    xobjects = recursos.get_object().get("/XObject") if recursos is not None else None
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for nombre in sorted(xobjects):
+            sha256.update(nombre.encode())
+            sha256.update(xobjects[nombre].get_object().get_data())
+    return sha256.hexdigest()
+
+
+def ruta_cache(huella, cache_dir=OCR_CACHE_DIR):
+    return os.path.join(cache_dir, f"{huella}.txt")
+
+
+def texto_en_cache(huella, cache_dir=OCR_CACHE_DIR):
+    """Texto reconocido de una página, o None si todavía no se reconoció"""
+    try:
+        with open(ruta_cache(huella, cache_dir), 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def guardar_en_cache(huella, texto, cache_dir=OCR_CACHE_DIR):
+    """Guardar el texto de una página; se escribe aparte y se renombra, porque varios
+    procesos de la ingesta pueden escribir en la caché a la vez"""
+    os.makedirs(cache_dir, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporal, ruta_cache(huella, cache_dir))
+
+
+def imagen_pagina(pdf_path, numero, dpi=OCR_DPI):
+    """Imagen de la página `numero` (desde 1) de un PDF"""
+    if RASTERIZADOR == "pymupdf":
+        with fitz.open(pdf_path) as documento:
+            pixmap = documento[numero - 1].get_pixmap(dpi=dpi)
+            return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    return convert_from_path(pdf_path, dpi=dpi, first_page=numero, last_page=numero)[0]
+
+
+def reconocer_pagina(pdf_path, numero, huella, cache_dir=OCR_CACHE_DIR):
+    """Texto de una página escaneada reconocido con Tesseract, o None si falla
+    (se ejecuta en un proceso del pool)"""
+    try:
+        texto = pytesseract.image_to_string(imagen_pagina(pdf_path, numero), lang=OCR_IDIOMA)
+    except Exception as e:
+        print(f"❌ Error en el OCR de la página {numero} de {pdf_path}: {e}")
+        return None
+    guardar_en_cache(huella, texto, cache_dir)
+    print(f"🔍 OCR de la página {numero} de {pdf_path}: {len(texto)} caracteres")
+    return texto
+
+
+def pendiente_ocr(paginas):
+    """Indicar si quedan páginas sin texto por reconocer"""
+    return any(pagina.huella is not None for pagina in paginas)
+
+
+def completar_paginas(documentos, jobs=1, pool=None, cache_dir=OCR_CACHE_DIR):
+    """Completar con OCR las páginas sin texto de {pdf_path: páginas}. Las ya reconocidas
+    salen de la caché y las demás se reparten en `pool` (o en `jobs` procesos); las que no
+    se pueden reconocer conservan su huella, así pendiente_ocr() las detecta"""
+    global _aviso_mostrado
+    completos = {pdf_path: list(paginas) for pdf_path, paginas in documentos.items()}
+    faltan = []
+    for pdf_path, paginas in completos.items():
+        for indice, pagina in enumerate(paginas):
+            if pagina.huella is None:
+                continue
+            texto = texto_en_cache(pagina.huella, cache_dir)
+            if texto is None:
+                faltan.append((pdf_path, indice))
+            else:
+                paginas[indice] = pagina._replace(texto=texto, huella=None)
+
+    if not faltan:
+        return completos
+    if not ocr_disponible():
+        if not _aviso_mostrado:
+            print("⚠️ Hay páginas escaneadas sin texto. Instala pytesseract, PyMuPDF y tesseract para reconocerlas")
+            _aviso_mostrado = True
+        return completos
+
+    argumentos = [
+        (pdf_path, completos[pdf_path][indice].numero, completos[pdf_path][indice].huella, cache_dir)
+        for pdf_path, indice in faltan
+    ]
+    if pool is not None:
+        textos = list(pool.map(reconocer_pagina, *zip(*argumentos)))
+    elif jobs > 1 and len(argumentos) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(argumentos))) as pool:
+            textos = list(pool.map(reconocer_pagina, *zip(*argumentos)))
+    else:
+        textos = [reconocer_pagina(*argumento) for argumento in argumentos]
+
+    for (pdf_path, indice), texto in zip(faltan, textos):
+        if texto is not None:
+            completos[pdf_path][indice] = completos[pdf_path][indice]._replace(texto=texto, huella=None)
+    return completos
@@ -0,0 +1,246 @@
+"""
+Almacén de pasajes de los documentos y resoluciones JCE
+Divide cada documento en pasajes solapados identificados por documento, artículo y página,
+y los guarda en un archivo binario con un índice de posiciones, para que el bot
+solo lea los pocos pasajes que necesita para cada consulta.
+Los pasajes de cada PDF se guardan también en pasajes_cache/ con el hash del archivo;
+process_all_documents.py los genera con las páginas que ya extrajo, así que al regenerar
+el almacén solo se extraen los PDF que la ingesta no procesó
+"""
+
+import json
+import mmap
+import os
+import re
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from ingest_manifest import IngestManifest, hash_archivo
+from ocr import completar_paginas, ocr_disponible, pendiente_ocr
+from pdf_extraction import PDF_AVAILABLE, iter_pdf_pages
+from retrieval import BM25Retriever
+
+PASSAGES_FILE = "jce_passages.bin"
+PASSAGES_INDEX_FILE = "jce_passages.json"
+FORMAT_VERSION = 1
+
+# Tamaño de cada pasaje y solapamiento entre pasajes consecutivos, en palabras
+PALABRAS_POR_PASAJE = 120
+SOLAPAMIENTO = 30
+
+PASAJES_CACHE_DIR = "pasajes_cache"
+# Las entradas de la caché divididas con otros parámetros no se usan
+DIVISION = [FORMAT_VERSION, PALABRAS_POR_PASAJE, SOLAPAMIENTO]
+
+# Encabezado de artículo al inicio de una línea: "Artículo 5", "ARTICULO 5", "Art. 5"
+ARTICLE_HEADING = re.compile(r'^\s*(?:art[íi]culo|art\.)\s*(\d+)', re.IGNORECASE | re.MULTILINE)
+
+Pasaje = namedtuple("Pasaje", ["fuente", "doc_id", "titulo", "articulo", "pagina", "offset", "longitud"])
+
+
+def dividir_en_pasajes(texto, articulo_inicial=None):
+    """Dividir el texto de una página en pasajes (artículo, texto) que no cruzan encabezados de artículo"""
+    segmentos = []
+    inicio, articulo = 0, articulo_inicial
+    for match in ARTICLE_HEADING.finditer(texto):
+        segmentos.append((articulo, texto[inicio:match.start()]))
+        inicio, articulo = match.start(), match.group(1)
+    segmentos.append((articulo, texto[inicio:]))
+
+    pasajes = []
+    paso = PALABRAS_POR_PASAJE - SOLAPAMIENTO
+    for articulo, segmento in segmentos:
+        palabras = segmento.split()
+        for desde in range(0, len(palabras), paso):
+            pasajes.append((articulo, " ".join(palabras[desde:desde + PALABRAS_POR_PASAJE])))
+            if desde + PALABRAS_POR_PASAJE >= len(palabras):
+                break
+
+    return pasajes, articulo
+
+
+def pasajes_de_paginas(paginas):
+    """Pasajes (artículo, página, contenido) de las páginas (número, texto) de un documento"""
+    pasajes = []
+    articulo = None
+    for numero, texto in paginas:
+        partes, articulo = dividir_en_pasajes(texto, articulo)
+        pasajes.extend((articulo_pasaje, numero, contenido) for articulo_pasaje, contenido in partes)
+    return pasajes
+
+
+def pasajes_en_cache(huella, cache_dir=PASAJES_CACHE_DIR):
+    """Pasajes guardados del PDF con ese hash, o None si no están (o si les faltan páginas
+    escaneadas que ahora se pueden reconocer)"""
+    try:
+        with open(os.path.join(cache_dir, f"{huella}.json"), 'r', encoding='utf-8') as f:
+            entrada = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if entrada.get("division") != DIVISION:
+        return None
+    if entrada.get("pendiente_ocr") and ocr_disponible():
+        return None
+    return [tuple(pasaje) for pasaje in entrada["pasajes"]]
+
+
+def guardar_pasajes(huella, pasajes, cache_dir=PASAJES_CACHE_DIR, pendiente_ocr=False):
+    """Guardar los pasajes de un PDF; se escribe aparte y se renombra para no dejar entradas a medias"""
+    os.makedirs(cache_dir, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        json.dump({"division": DIVISION, "pendiente_ocr": pendiente_ocr, "pasajes": pasajes},
+                  f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporal, os.path.join(cache_dir, f"{huella}.json"))
+
+
+def pasajes_pdf(pdf_path, huella, cache_dir=PASAJES_CACHE_DIR, jobs=1):
+    """Pasajes de un PDF: de la caché o extrayendo sus páginas; las escaneadas se reconocen
+    en `jobs` procesos"""
+    pasajes = pasajes_en_cache(huella, cache_dir)
+    if pasajes is None:
+        paginas = completar_paginas({pdf_path: list(iter_pdf_pages(pdf_path))}, jobs)[pdf_path]
+        pasajes = pasajes_de_paginas((pagina.numero, pagina.texto) for pagina in paginas)
+        guardar_pasajes(huella, pasajes, cache_dir, pendiente_ocr(paginas))
+    return pasajes
+
+
+class PassageStore:
+    def __init__(self, pasajes, datos):
+        self.pasajes = pasajes
+        # Contenido de los pasajes en UTF-8 (bytes en memoria o archivo mapeado)
+        self.datos = datos
+        self.retriever = None
+
+    def __len__(self):
+        return len(self.pasajes)
+
+    def texto(self, pasaje):
+        """Leer el texto de un pasaje a partir de su posición"""
+        return self.datos[pasaje.offset:pasaje.offset + pasaje.longitud].decode("utf-8")
+
+    def indexar(self):
+        """Construir el índice BM25 de los pasajes"""
+        retriever = BM25Retriever()
+        for posicion, pasaje in enumerate(self.pasajes):
+            retriever.agregar(posicion, f"{pasaje.titulo} {self.texto(pasaje)}", pasaje.fuente, posicion)
+        retriever.finalizar()
+        self.retriever = retriever
+        return retriever
+
+    def resultado(self, posicion, puntaje):
+        """Armar un resultado (pasaje, texto, puntaje) a partir de la posición del pasaje"""
+        pasaje = self.pasajes[posicion]
+        return pasaje, self.texto(pasaje), puntaje
+
+    def buscar(self, consulta, k=4):
+        """Devolver los k pasajes más relevantes como (pasaje, texto, puntaje)"""
+        if self.retriever is None:
+            self.indexar()
+        return [
+            self.resultado(resultado.doc_id, resultado.puntaje)
+            for resultado in self.retriever.buscar(consulta, k=k)
+        ]
+
+    @classmethod
+    def load(cls, passages_file=PASSAGES_FILE, index_file=PASSAGES_INDEX_FILE):
+        """Abrir un almacén guardado en disco; el contenido se lee bajo demanda"""
+        with open(index_file, 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+        if indice.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Versión de almacén de pasajes no soportada: {indice.get('version')}")
+
+        with open(passages_file, 'rb') as f:
+            datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(passages_file) else b""
+
+        return cls([Pasaje(*registro) for registro in indice["pasajes"]], datos)
+
+    @classmethod
+    def from_documents(cls, documentos, resoluciones, documentos_dir=None, huella=hash_archivo,
+                       cache_dir=PASAJES_CACHE_DIR, jobs=1):
+        """Construir un almacén en memoria a partir de los documentos y resoluciones JCE;
+        `huella(path)` da el hash con que se guardan en caché los pasajes de cada PDF"""
+        pasajes = []
+        datos = bytearray()
+
+        def agregar(fuente, doc_id, titulo, partes):
+            for articulo, numero, contenido in partes:
+                codificado = contenido.encode("utf-8")
+                pasajes.append(Pasaje(fuente, doc_id, titulo, articulo, numero, len(datos), len(codificado)))
+                datos.extend(codificado)
+
+        for filename, document in documentos.items():
+            titulo = document.get("informacion", {}).get("titulo", filename)
+            pdf_path = os.path.join(documentos_dir, filename) if documentos_dir else None
+            if PDF_AVAILABLE and pdf_path and os.path.exists(pdf_path):
+                # Pasajes con número de página; si el PDF no se puede leer se usa el contenido guardado.
+                # Los PDF se procesan de a uno, así solo están en memoria las páginas del actual
+                try:
+                    agregar("documento", filename, titulo, pasajes_pdf(pdf_path, huella(pdf_path), cache_dir, jobs))
+                    continue
+                except Exception as e:
+                    print(f"❌ Error extrayendo páginas de {pdf_path}: {e}")
+            agregar("documento", filename, titulo, pasajes_de_paginas([(None, document.get("contenido", ""))]))
+
+        for title, resolution in resoluciones.items():
+            agregar("resolucion", title, title, pasajes_de_paginas([(None, resolution.get("contenido", ""))]))
+
+        return cls(pasajes, bytes(datos))
+
+    def save(self, passages_file=PASSAGES_FILE, index_file=PASSAGES_INDEX_FILE):
+        """Guardar el contenido en un archivo binario y las posiciones en un índice JSON"""
+        with open(passages_file, 'wb') as f:
+            f.write(self.datos)
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "campos": list(Pasaje._fields),
+                "pasajes": [list(pasaje) for pasaje in self.pasajes]
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        print(f"✅ {len(self.pasajes)} pasajes guardados en {passages_file}")
+
+
+def load_categorized(path):
+    """Cargar un archivo JSON por categorías y aplanarlo en {id: documento}"""
+    documentos = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for category, category_documents in json.load(f).items():
+                if category != "fecha_actualizacion":
+                    documentos.update(category_documents)
+    return documentos
+
+
+def build_passage_store(documents_file="jce_documents.json", resolutions_file="jce_resolutions.json",
+                        documentos_dir="documentos_jce", jobs=os.cpu_count() or 1):
+    """Generar el almacén de pasajes a partir de los archivos de documentos y resoluciones"""
+    # Los hashes de los PDF son los que registró process_all_documents.py en el manifiesto,
+    # así los archivos sin cambios no se vuelven a leer
+    manifest = IngestManifest("documentos", None)
+    store = PassageStore.from_documents(
+        load_categorized(documents_file),
+        load_categorized(resolutions_file),
+        documentos_dir if Path(documentos_dir).exists() else None,
+        huella=manifest.hash_actual,
+        jobs=jobs
+    )
+    store.save()
+    return store
+
+
+def main():
+    """Función principal"""
+    print("📑 Generador de Pasajes JCE")
+    print("=" * 40)
+
+    if not PDF_AVAILABLE:
+        print("⚠️ PyPDF2 no está instalado: los pasajes no tendrán número de página")
+
+    store = build_passage_store()
+    documentos = {pasaje.doc_id for pasaje in store.pasajes}
+    print(f"\n🎉 {len(store)} pasajes de {len(documentos)} documentos")
+
+
+if __name__ == "__main__":
+    main()
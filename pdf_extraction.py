@@ -0,0 +1,67 @@
+"""
+Extracción de texto de PDF página por página
+Las páginas se entregan de a una con su número, para que el texto completo nunca se
+arme por concatenación y los pasajes puedan citar la página; si una página falla se
+entrega vacía con el error y el resto del documento se sigue extrayendo.
+Las páginas escaneadas (sin capa de texto) se entregan vacías con su huella, para que
+ocr.completar_paginas las reconozca después en el pool de la ingesta
+"""
+
+import hashlib
+from collections import namedtuple
+
+try:
+    import PyPDF2
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+from ingest_manifest import hash_archivo
+from ocr import huella_pagina
+
+# Número de página desde 1, texto extraído, mensaje de error (None si se extrajo bien) y
+# huella de las páginas sin texto que faltan reconocer con OCR (None en las demás)
+Pagina = namedtuple("Pagina", ["numero", "texto", "error", "huella"], defaults=(None,))
+
+
+def contar_paginas(pdf_path):
+    """Cantidad de páginas de un PDF"""
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def iter_pdf_pages(pdf_path, inicio=0, fin=None):
+    """Generar las páginas [inicio, fin) de un PDF; si no se puede abrir se lanza la excepción"""
+    hash_pdf = None
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        total = len(pdf_reader.pages)
+        for indice in range(inicio, total if fin is None else min(fin, total)):
+            try:
+                page = pdf_reader.pages[indice]
+                texto = page.extract_text() or ""
+            except Exception as e:
+                print(f"⚠️ Página {indice + 1} de {pdf_path} sin texto: {e}")
+                yield Pagina(indice + 1, "", str(e))
+                continue
+            if texto.strip():
+                yield Pagina(indice + 1, texto, None)
+                continue
+            try:
+                huella = huella_pagina(page)
+            except Exception:
+                # PyPDF2 no decodifica algunas imágenes escaneadas: la página se identifica por el archivo
+                hash_pdf = hash_pdf or hash_archivo(pdf_path)
+                huella = hashlib.sha256(f"{hash_pdf}:{indice + 1}".encode()).hexdigest()
+            yield Pagina(indice + 1, texto, None, huella)
+
+
+def paginas_pdf(pdf_path, inicio=0, fin=None):
+    """Lista de las páginas [inicio, fin) de un PDF"""
+    return list(iter_pdf_pages(pdf_path, inicio, fin))
+
+
+def unir_paginas(paginas):
+    """Texto de las páginas, cada una terminada en un salto de línea"""
+    return "".join(f"{pagina.texto}\n" for pagina in paginas)
+
@@ -3,22 +3,75 @@ Script para procesar todos los documentos PDF de la JCE
 Extrae información y la integra con el bot
 """
 
+import argparse
 import os
 import json
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
+from extraction import informacion_documento
+from ingest_manifest import IngestManifest
+from knowledge_snapshot import build_snapshot
+from ocr import completar_paginas, ocr_disponible, pendiente_ocr
+from passages import build_passage_store, guardar_pasajes, pasajes_de_paginas
+from semantic_search import actualizar_embeddings
+from pdf_extraction import PDF_AVAILABLE, contar_paginas, iter_pdf_pages, paginas_pdf, unir_paginas
+
+if not PDF_AVAILABLE:
     print("⚠️ PyPDF2 no está instalado. Para procesar PDFs, ejecuta: pip install PyPDF2")
 
+# Versión de la extracción: al cambiarla se vuelven a procesar todos los PDF
+EXTRACTOR_VERSION = 1
+
+# Páginas por tarea en el modo paralelo: los documentos grandes se reparten en varios
+# rangos para que un solo PDF no deje a los demás procesos sin trabajo
+PAGINAS_POR_TAREA = 16
+
+# Rangos en curso por proceso: limita las páginas extraídas que esperan en memoria
+TAREAS_POR_PROCESO = 2
+
+
+def paginas_documento(pdf_path):
+    """Cantidad de páginas de un PDF, o None si no se puede abrir (se ejecuta en un proceso del pool)"""
+    try:
+        return contar_paginas(pdf_path)
+    except Exception as e:
+        print(f"❌ Error abriendo {pdf_path}: {e}")
+        return None
+
+
+def analizar_documento(paginas, filename):
+    """Contenido, información estructurada y pasajes de un documento a partir de sus páginas
+    (se ejecuta en un proceso del pool)"""
+    content = unir_paginas(paginas)
+    info = informacion_documento(content, filename.replace('.pdf', ''))
+    return content, info, pasajes_de_paginas((pagina.numero, pagina.texto) for pagina in paginas)
+
+
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, cargar=True):
         self.documents_file = "jce_documents.json"
-        self.load_documents()
+        self.manifest = IngestManifest("documentos", EXTRACTOR_VERSION, ocr_disponible=ocr_disponible())
+        # PDFs a los que les quedaron páginas escaneadas sin reconocer
+        self.pendientes_ocr = set()
+        if cargar:
+            self.load_documents()
+        else:
+            self.documents = self.empty_documents()
+    
+    def empty_documents(self):
+        """Estructura vacía de documentos por categoría"""
+        return {
+            "leyes": {},
+            "reglamentos": {},
+            "resoluciones": {},
+            "circulares": {},
+            "manuales": {},
+            "instrucciones": {},
+            "fecha_actualizacion": datetime.now().isoformat()
+        }
     
     def load_documents(self):
         """Cargar documentos existentes"""
@@ -26,39 +79,25 @@ class DocumentProcessor:
             with open(self.documents_file, 'r', encoding='utf-8') as f:
                 self.documents = json.load(f)
         else:
-            self.documents = {
-                "leyes": {},
-                "reglamentos": {},
-                "resoluciones": {},
-                "circulares": {},
-                "manuales": {},
-                "instrucciones": {},
-                "fecha_actualizacion": datetime.now().isoformat()
-            }
+            self.documents = self.empty_documents()
     
     def save_documents(self):
         """Guardar documentos actualizados"""
         self.documents["fecha_actualizacion"] = datetime.now().isoformat()
         with open(self.documents_file, 'w', encoding='utf-8') as f:
             json.dump(self.documents, f, ensure_ascii=False, indent=2)
+        # El manifiesto se guarda después, para que nunca registre algo que no quedó en el JSON
+        self.manifest.save()
         print(f"✅ Documentos guardados en {self.documents_file}")
     
-    def extract_text_from_pdf(self, pdf_path):
-        """Extraer texto de un archivo PDF"""
+    def extract_pages_from_pdf(self, pdf_path):
+        """Extraer las páginas de un archivo PDF"""
         if not PDF_AVAILABLE:
             print("❌ PyPDF2 no está disponible")
             return None
         
         try:
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n"
-            
-            return text
+            return list(iter_pdf_pages(pdf_path))
         except Exception as e:
             print(f"❌ Error extrayendo texto de {pdf_path}: {e}")
             return None
@@ -82,188 +121,178 @@ class DocumentProcessor:
         else:
             return "otros"
     
-    def extract_document_info(self, content, filename):
-        """Extraer información del documento"""
-        import re
-        
-        info = {
-            "titulo": filename.replace('.pdf', ''),
-            "numero": self.extract_number(content),
-            "fecha": self.extract_date(content),
-            "articulos": self.extract_articles(content),
-            "capitulos": self.extract_chapters(content),
-            "disposiciones": self.extract_dispositions(content),
-            "contactos": self.extract_contacts(content),
-            "palabras_clave": self.extract_keywords(content)
-        }
-        return info
-    
-    def extract_number(self, content):
-        """Extraer número del documento"""
-        import re
-        patterns = [
-            r'No\.?\s*(\d+)',
-            r'Número\s*(\d+)',
-            r'(\d+)-(\d{4})',
-            r'Res\.\s*(\d+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        return "No especificado"
-    
-    def extract_date(self, content):
-        """Extraer fecha del documento"""
-        import re
-        patterns = [
-            r'(\d{1,2}/\d{1,2}/\d{4})',
-            r'(\d{1,2}-\d{1,2}-\d{4})',
-            r'(\d{1,2}\s+de\s+\w+\s+de\s+\d{4})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, content)
-            if match:
-                return match.group(1)
-        return "No especificada"
-    
-    def extract_articles(self, content):
-        """Extraer artículos del documento"""
-        import re
-        articles = []
-        pattern = r'Artículo\s+(\d+)\.?\s*([^.]*\.)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        
-        for match in matches:
-            articles.append({
-                "numero": match[0],
-                "contenido": match[1].strip()
-            })
-        
-        return articles
-    
-    def extract_chapters(self, content):
-        """Extraer capítulos del documento"""
-        import re
-        chapters = []
-        pattern = r'Capítulo\s+(\d+)\.?\s*([^.]*\.)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        
-        for match in matches:
-            chapters.append({
-                "numero": match[0],
-                "contenido": match[1].strip()
-            })
-        
-        return chapters
-    
-    def extract_dispositions(self, content):
-        """Extraer disposiciones"""
-        import re
-        dispositions = []
-        pattern = r'Disposición\s+(\w+)\.?\s*([^.]*\.)'
-        matches = re.findall(pattern, content, re.IGNORECASE)
-        
-        for match in matches:
-            dispositions.append({
-                "tipo": match[0],
-                "contenido": match[1].strip()
-            })
-        
-        return dispositions
-    
-    def extract_contacts(self, content):
-        """Extraer información de contacto"""
-        import re
-        contacts = []
-        
-        # Buscar teléfonos
-        phone_pattern = r'\(\d{3}\)\s*\d{3}-\d{4}'
-        phones = re.findall(phone_pattern, content)
-        contacts.extend([{"tipo": "telefono", "valor": phone} for phone in phones])
-        
-        # Buscar emails
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, content)
-        contacts.extend([{"tipo": "email", "valor": email} for email in emails])
-        
-        return contacts
-    
-    def extract_keywords(self, content):
-        """Extraer palabras clave relevantes"""
-        import re
-        
-        keywords = []
-        relevant_terms = [
-            "acta", "nacimiento", "cedula", "identidad", "matrimonio", 
-            "divorcio", "naturalizacion", "apostilla", "registro civil",
-            "junta central electoral", "jce", "documento", "tramite",
-            "requisito", "costo", "tiempo", "oficina", "horario"
-        ]
-        
-        content_lower = content.lower()
-        for term in relevant_terms:
-            if term in content_lower:
-                keywords.append(term)
-        
-        return keywords
-    
-    def process_pdf_document(self, pdf_path):
-        """Procesar un documento PDF"""
+    def process_pdf_document(self, pdf_path, jobs=1):
+        """Procesar un documento PDF; sus páginas escaneadas se reconocen en `jobs` procesos"""
         if not PDF_AVAILABLE:
             print("❌ PyPDF2 no está disponible")
             return False
         
         try:
-            # Extraer texto del PDF
-            content = self.extract_text_from_pdf(pdf_path)
-            if not content:
+            # Extraer las páginas del PDF
+            paginas = self.extract_pages_from_pdf(pdf_path)
+            if not paginas:
                 return False
+            paginas = self.complete_pages({pdf_path: paginas}, jobs=jobs)[pdf_path]
             
-            # Obtener información del archivo
-            filename = os.path.basename(pdf_path)
-            category = self.categorize_document(filename)
-            
-            # Extraer información estructurada
-            info = self.extract_document_info(content, filename)
-            
-            # Agregar a los documentos
-            if category not in self.documents:
-                self.documents[category] = {}
-            
-            self.documents[category][filename] = {
-                "contenido": content,
-                "informacion": info,
-                "fuente": pdf_path,
-                "fecha_procesamiento": datetime.now().isoformat(),
-                "categoria": category,
-                "formato": "PDF"
-            }
-            
-            print(f"✅ Documento '{filename}' procesado y categorizado como '{category}'")
+            # Extraer información estructurada y pasajes
+            content, info, pasajes = analizar_documento(paginas, os.path.basename(pdf_path))
+            self.add_document(pdf_path, content, info, pasajes)
             return True
             
         except Exception as e:
             print(f"❌ Error procesando {pdf_path}: {e}")
             return False
     
-    def process_all_documents(self, directory_path):
-        """Procesar todos los PDFs de un directorio"""
+    def complete_pages(self, documentos, jobs=1, pool=None):
+        """Reconocer con OCR las páginas escaneadas de {pdf_path: páginas} y anotar los PDF
+        a los que les quedaron páginas sin reconocer"""
+        documentos = completar_paginas(documentos, jobs, pool)
+        for pdf_path, paginas in documentos.items():
+            if pendiente_ocr(paginas):
+                self.pendientes_ocr.add(pdf_path)
+        return documentos
+    
+    def add_document(self, pdf_path, content, info, pasajes=None):
+        """Agregar un documento procesado a su categoría; sus pasajes se guardan en la caché
+        con el hash del archivo, así build_passage_store no vuelve a extraer el PDF"""
+        filename = os.path.basename(pdf_path)
+        category = self.categorize_document(filename)
+        if category not in self.documents:
+            self.documents[category] = {}
+        
+        self.documents[category][filename] = {
+            "contenido": content,
+            "informacion": info,
+            "fuente": pdf_path,
+            "fecha_procesamiento": datetime.now().isoformat(),
+            "categoria": category,
+            "formato": "PDF"
+        }
+        if pasajes is not None:
+            guardar_pasajes(self.manifest.hash_actual(pdf_path), pasajes,
+                            pendiente_ocr=pdf_path in self.pendientes_ocr)
+        
+        print(f"✅ Documento '{filename}' procesado y categorizado como '{category}'")
+    
+    def process_documents_parallel(self, pdf_paths, jobs):
+        """Procesar varios PDFs repartiendo rangos de páginas entre `jobs` procesos; cada documento
+        se completa con OCR y se analiza apenas se extraen todas sus páginas, y solo hay unos pocos
+        rangos en curso a la vez, así la memoria no crece con el tamaño del lote. Devuelve los
+        que se procesaron"""
+        if not PDF_AVAILABLE:
+            print("❌ PyPDF2 no está disponible")
+            return []
+        
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            paginas = dict(zip(pdf_paths, pool.map(paginas_documento, pdf_paths)))
+            
+            # Una tarea por rango de páginas, de los documentos más largos a los más cortos
+            rangos = [
+                (pdf_path, inicio, min(inicio + PAGINAS_POR_TAREA, paginas[pdf_path]))
+                for pdf_path in sorted(pdf_paths, key=lambda path: -(paginas[path] or 0))
+                for inicio in range(0, paginas[pdf_path] or 0, PAGINAS_POR_TAREA)
+            ]
+            faltan = {pdf_path: 0 for pdf_path in pdf_paths}
+            for pdf_path, _, _ in rangos:
+                faltan[pdf_path] += 1
+            
+            extraidas = {pdf_path: {} for pdf_path in pdf_paths}
+            fallidos = {pdf_path for pdf_path in pdf_paths if paginas[pdf_path] is None}
+            analisis = {}
+            pendientes = iter(rangos)
+            en_curso = {}
+            completadas = 0
+            while True:
+                for pdf_path, inicio, fin in islice(pendientes, TAREAS_POR_PROCESO * jobs - len(en_curso)):
+                    en_curso[pool.submit(paginas_pdf, pdf_path, inicio, fin)] = (pdf_path, inicio, fin)
+                if not en_curso:
+                    break
+                
+                listas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in listas:
+                    pdf_path, inicio, fin = en_curso.pop(futuro)
+                    completadas += 1
+                    faltan[pdf_path] -= 1
+                    try:
+                        paginas_rango = futuro.result()
+                    except Exception as e:
+                        fallidos.add(pdf_path)
+                        print(f"❌ Error extrayendo texto de {pdf_path}: {e}")
+                    else:
+                        if pdf_path not in fallidos:
+                            extraidas[pdf_path][inicio] = paginas_rango
+                        print(f"   [{completadas}/{len(rangos)}] {os.path.basename(pdf_path)}, "
+                              f"páginas {inicio + 1}-{fin} de {paginas[pdf_path]}")
+                    if faltan[pdf_path]:
+                        continue
+                    
+                    # Documento completo: unir los rangos en el orden de las páginas, reconocer
+                    # sus páginas escaneadas y analizarlo en el pool
+                    partes = extraidas.pop(pdf_path)
+                    if pdf_path in fallidos:
+                        continue
+                    paginas_doc = [pagina for inicio in sorted(partes) for pagina in partes[inicio]]
+                    paginas_doc = self.complete_pages({pdf_path: paginas_doc}, pool=pool)[pdf_path]
+                    analisis[pdf_path] = pool.submit(analizar_documento, paginas_doc, os.path.basename(pdf_path))
+            
+            # Agregar en el orden de los archivos para que el resultado no dependa de los procesos
+            procesados = []
+            for pdf_path in pdf_paths:
+                if pdf_path in analisis:
+                    content, info, pasajes = analisis.pop(pdf_path).result()
+                    self.add_document(pdf_path, content, info, pasajes)
+                    procesados.append(pdf_path)
+        return procesados
+    
+    def count_page_ranges(self, pdf_paths):
+        """Rangos de PAGINAS_POR_TAREA páginas entre los PDFs pendientes: con más de uno conviene
+        el modo paralelo, aunque sea un solo documento largo. Con varios PDFs alcanza con
+        contarlos, cada uno tiene al menos un rango"""
+        if len(pdf_paths) != 1:
+            return len(pdf_paths)
+        total_paginas = paginas_documento(pdf_paths[0]) or 0
+        return -(-total_paginas // PAGINAS_POR_TAREA)
+    
+    def document_exists(self, entrada):
+        """Indicar si la entrada de un archivo del manifiesto sigue en los documentos"""
+        return entrada["clave"] in self.documents.get(entrada["categoria"], {})
+    
+    def remove_deleted(self, directory_path, pdf_paths):
+        """Quitar los documentos cuyos PDF ya no están en el directorio"""
+        eliminados = self.manifest.eliminados(directory_path, pdf_paths)
+        for pdf_path, entrada in eliminados.items():
+            self.documents.get(entrada["categoria"], {}).pop(entrada["clave"], None)
+            self.manifest.quitar(pdf_path)
+            print(f"🗑️ Documento '{entrada['clave']}' eliminado: {pdf_path} ya no existe")
+        return len(eliminados)
+    
+    def process_all_documents(self, directory_path, jobs=1, incremental=True):
+        """Procesar los PDFs de un directorio, en `jobs` procesos si es mayor que 1; en modo
+        incremental solo los nuevos o modificados desde la última ejecución"""
         if not os.path.exists(directory_path):
             print(f"❌ Directorio no encontrado: {directory_path}")
             return False
         
-        processed_count = 0
-        for filename in os.listdir(directory_path):
-            if filename.endswith('.pdf'):
-                file_path = os.path.join(directory_path, filename)
-                if self.process_pdf_document(file_path):
-                    processed_count += 1
+        pdf_paths = [
+            os.path.join(directory_path, filename)
+            for filename in sorted(os.listdir(directory_path))
+            if filename.endswith('.pdf')
+        ]
+        self.remove_deleted(directory_path, pdf_paths)
+        pendientes = self.manifest.pendientes(pdf_paths, self.document_exists) if incremental else pdf_paths
+        
+        if jobs > 1 and self.count_page_ranges(pendientes) > 1:
+            procesados = self.process_documents_parallel(pendientes, jobs)
+        else:
+            procesados = [pdf_path for pdf_path in pendientes if self.process_pdf_document(pdf_path, jobs)]
+        for pdf_path in procesados:
+            filename = os.path.basename(pdf_path)
+            self.manifest.registrar(pdf_path, self.categorize_document(filename), filename,
+                                    pendiente_ocr=pdf_path in self.pendientes_ocr)
         
-        print(f"✅ {processed_count} documentos procesados desde {directory_path}")
-        return processed_count
+        print(f"✅ {len(procesados)} documentos procesados desde {directory_path} "
+              f"({len(pdf_paths) - len(pendientes)} sin cambios)")
+        return len(procesados)
     
     def generate_bot_responses(self):
         """Generar respuestas del bot basadas en los documentos"""
@@ -332,6 +361,13 @@ class DocumentProcessor:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Procesar los documentos PDF de la JCE")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Procesos para extraer los PDFs (por defecto, uno por núcleo)")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Volver a procesar todos los PDFs aunque no hayan cambiado")
+    args = parser.parse_args()
+    
     if not PDF_AVAILABLE:
         print("❌ PyPDF2 no está instalado")
         print("💡 Para instalar: pip install PyPDF2")
@@ -345,7 +381,12 @@ def main():
     # Procesar documentos
     documentos_dir = Path("documentos_jce")
     if documentos_dir.exists():
-        processor.process_all_documents(str(documentos_dir))
+        processor.process_all_documents(str(documentos_dir), args.jobs, incremental=not args.forzar)
+    
+    if not processor.manifest.cambios:
+        processor.manifest.save()
+        print("\n✅ No hay documentos nuevos, modificados ni eliminados")
+        return
     
     # Generar respuestas del bot
     bot_responses = processor.generate_bot_responses()
@@ -367,6 +408,10 @@ def main():
     # Guardar documentos
     processor.save_documents()
     
+    # Regenerar los pasajes, sus embeddings y el snapshot que usa el bot
+    actualizar_embeddings(build_passage_store(jobs=args.jobs))
+    build_snapshot()
+    
     print("\n🎉 Proceso completado!")
     print("📊 Estadísticas:")
     for category, documents in processor.documents.items():
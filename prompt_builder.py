@@ -0,0 +1,88 @@
+"""
+Armado del prompt con presupuesto de tokens
+El prompt se compone del mensaje de sistema, los pasajes recuperados (con un espacio
+reservado), el resumen de los turnos antiguos si lo hay y los turnos más recientes
+de la conversación que quepan en el presupuesto; los que no caben se omiten.
+El mensaje actual del usuario tiene prioridad: si falta espacio se recortan los
+pasajes y el resumen, nunca la pregunta
+"""
+
+# Caracteres por token aproximados para texto en español
+CARACTERES_POR_TOKEN = 4
+
+ETIQUETAS = {"user": "Usuario", "assistant": "Asistente", "summary": "Resumen de la conversación anterior"}
+
+
+def estimar_tokens(texto):
+    """Estimación rápida de la cantidad de tokens de un texto"""
+    return len(texto) // CARACTERES_POR_TOKEN + 1
+
+
+def recortar(texto, max_tokens):
+    """Recortar un texto para que no supere `max_tokens` tokens estimados"""
+    max_caracteres = max(0, max_tokens - 1) * CARACTERES_POR_TOKEN
+    if len(texto) <= max_caracteres:
+        return texto
+    return texto[:max_caracteres].rsplit(" ", 1)[0] + "…"
+
+
+def linea_turno(turno):
+    """Línea del prompt para un turno de usuario o asistente"""
+    return f"{ETIQUETAS[turno.role]}: {turno.content}\n"
+
+
+class PromptBuilder:
+    def __init__(self, max_tokens=4000, reserva_pasajes=1500):
+        self.max_tokens = max_tokens
+        # Tokens reservados para los pasajes oficiales, aunque la conversación sea larga
+        self.reserva_pasajes = reserva_pasajes
+
+    def presupuesto_pasajes(self, turnos):
+        """Tokens disponibles para los pasajes: la reserva más lo que no use la conversación,
+        sin quitarle espacio al mensaje de sistema ni al mensaje actual"""
+        usados = sum(turno.tokens for turno in turnos)
+        maximo = self.max_tokens - turnos[0].tokens - (turnos[-1].tokens if len(turnos) > 1 else 0)
+        return max(0, min(max(self.reserva_pasajes, self.max_tokens - usados), maximo))
+
+    def construir(self, turnos, contexto=""):
+        """Armar el prompt con el mensaje de sistema, el contexto y los turnos más recientes que quepan"""
+        system, conversacion = turnos[0], turnos[1:]
+        disponible = self.max_tokens - system.tokens
+
+        resumen = None
+        if conversacion and conversacion[0].role == "summary":
+            resumen, conversacion = conversacion[0], conversacion[1:]
+
+        # El mensaje actual va primero; solo se recorta si no cabe ni siquiera solo
+        actual = []
+        if conversacion:
+            turno, conversacion = conversacion[-1], conversacion[:-1]
+            if turno.tokens > disponible:
+                actual = [f"{ETIQUETAS[turno.role]}: {recortar(turno.content, max(disponible, 1))}\n"]
+            else:
+                actual = [linea_turno(turno)]
+            disponible -= turno.tokens
+
+        # Después los pasajes y el resumen de los turnos antiguos, recortados si no caben
+        if contexto and estimar_tokens(contexto) > disponible:
+            contexto = recortar(contexto, disponible).rstrip() + "\n\n" if disponible > 1 else ""
+        disponible -= estimar_tokens(contexto) if contexto else 0
+
+        lineas_resumen = []
+        if resumen is not None and disponible > 1:
+            if resumen.tokens > disponible:
+                lineas_resumen = [f"{ETIQUETAS[resumen.role]}: {recortar(resumen.content, disponible)}\n"]
+            else:
+                lineas_resumen = [linea_turno(resumen)]
+            disponible -= resumen.tokens
+
+        # Los turnos anteriores que quepan, del más reciente al más antiguo
+        seleccion = []
+        for turno in reversed(conversacion):
+            if turno.tokens > disponible:
+                break
+            seleccion.append(linea_turno(turno))
+            disponible -= turno.tokens
+
+        seleccion.reverse()
+        return "".join([system.content, "\n\n", contexto, *lineas_resumen, *seleccion, *actual])
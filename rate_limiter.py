@@ -0,0 +1,157 @@
+"""
+Limitador de llamadas a Gemini con token buckets
+Un bucket global ajustado a la cuota de la API y un bucket por usuario para que
+un solo gestor no acapare la cuota; cuando no hay tokens, la llamada espera su
+turno hasta un plazo máximo en lugar de pasar de inmediato a la respuesta predefinida.
+Los turnos se dan por orden de llegada: mientras un pedido anterior pueda tomar el token
+global, los más nuevos esperan, así quien espera hace más tiempo no pierde contra ellos.
+Las llamadas de baja prioridad (como los resúmenes) piden una reserva: solo toman un
+token global si después quedan al menos esos tokens para las respuestas
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    def __init__(self, capacidad, tasa, ahora=None):
+        # Máximo de tokens acumulables (ráfaga) y tokens repuestos por segundo
+        self.capacidad = capacidad
+        self.tasa = tasa
+        self.tokens = float(capacidad)
+        self.actualizado = time.monotonic() if ahora is None else ahora
+
+    def recargar(self, ahora):
+        """Reponer los tokens acumulados desde la última actualización"""
+        transcurrido = ahora - self.actualizado
+        if transcurrido > 0:
+            self.tokens = min(self.capacidad, self.tokens + transcurrido * self.tasa)
+            self.actualizado = ahora
+
+    def espera(self, ahora, minimo=1):
+        """Segundos hasta que haya `minimo` tokens disponibles (0 si ya los hay)"""
+        self.recargar(ahora)
+        if self.tokens >= minimo:
+            return 0.0
+        return (minimo - self.tokens) / self.tasa
+
+    def consumir(self):
+        self.tokens -= 1
+
+
+class Turno:
+    """Pedido que espera un token, en la cola por orden de llegada"""
+    __slots__ = ("user_id", "reserva", "aviso")
+
+    def __init__(self, user_id, reserva):
+        self.user_id = user_id
+        self.reserva = reserva
+        # Futuro que se completa cuando otro pedido toma un token o deja la cola
+        self.aviso = None
+
+
+class RateLimiter:
+    def __init__(self, por_minuto, por_minuto_usuario, rafaga=None, rafaga_usuario=None, max_usuarios=10000):
+        self.por_minuto_usuario = por_minuto_usuario
+        # Por defecto un usuario puede enviar los mensajes de un minuto seguidos sin esperar
+        self.rafaga_usuario = rafaga_usuario or max(1, por_minuto_usuario)
+        self.max_usuarios = max_usuarios
+        self.global_bucket = TokenBucket(rafaga or max(1, por_minuto // 4), por_minuto / 60)
+        # user_id -> TokenBucket, en orden de uso (el más reciente al final)
+        self.usuarios = OrderedDict()
+        self.lock = threading.Lock()
+        # Pedidos que esperan turno, del más antiguo al más nuevo
+        self.cola = []
+
+        self.concedidas = 0
+        self.rechazadas = 0
+        self.en_espera = 0
+        self.tiempo_espera_total = 0.0
+
+    def _bucket_usuario(self, user_id, ahora):
+        bucket = self.usuarios.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rafaga_usuario, self.por_minuto_usuario / 60, ahora)
+            self.usuarios[user_id] = bucket
+            # Un bucket olvidado equivale a uno lleno, así que se puede descartar el más antiguo
+            while len(self.usuarios) > self.max_usuarios:
+                self.usuarios.popitem(last=False)
+        else:
+            self.usuarios.move_to_end(user_id)
+        return bucket
+
+    def _minimo(self, reserva):
+        """Tokens globales que hacen falta para tomar uno dejando libre la reserva; la reserva no
+        puede superar la ráfaga: con el bucket lleno siempre hay turno"""
+        return 1 + min(reserva, self.global_bucket.capacidad - 1)
+
+    def _puede_tomar(self, turno, ahora):
+        """Indicar si el pedido en espera ya podría tomar su token"""
+        bucket = self.usuarios.get(turno.user_id)
+        return ((bucket is None or bucket.espera(ahora) == 0)
+                and self.global_bucket.espera(ahora, self._minimo(turno.reserva)) == 0)
+
+    def intentar(self, user_id, reserva=0, anteriores=()):
+        """Tomar un token global y uno del usuario; si no se puede, devolver los segundos a esperar,
+        o None si el token le corresponde a alguno de los pedidos `anteriores` que siguen esperando"""
+        with self.lock:
+            ahora = time.monotonic()
+            bucket = self._bucket_usuario(user_id, ahora)
+            espera = max(self.global_bucket.espera(ahora, self._minimo(reserva)), bucket.espera(ahora))
+            if espera > 0:
+                return espera
+            if any(self._puede_tomar(turno, ahora) for turno in anteriores):
+                return None
+            self.global_bucket.consumir()
+            bucket.consumir()
+            return 0.0
+
+    def _avisar(self):
+        """Despertar a los pedidos en espera para que vuelvan a intentar en orden"""
+        for turno in self.cola:
+            if turno.aviso is not None and not turno.aviso.done():
+                turno.aviso.set_result(None)
+
+    async def acquire(self, user_id, espera_maxima=0.0, reserva=0):
+        """Esperar un turno para llamar a la API; False si no llega antes del plazo.
+        `reserva` son los tokens globales que deben quedar libres (baja prioridad)"""
+        inicio = time.monotonic()
+        limite = inicio + espera_maxima
+        turno = Turno(user_id, reserva)
+        self.cola.append(turno)
+        self.en_espera += 1
+        try:
+            while True:
+                espera = self.intentar(user_id, reserva, self.cola[:self.cola.index(turno)])
+                ahora = time.monotonic()
+                if espera == 0:
+                    self.concedidas += 1
+                    self.tiempo_espera_total += ahora - inicio
+                    return True
+                # Sin espera conocida (el token es de un pedido anterior) se espera su aviso
+                restante = limite - ahora
+                if restante <= 0 or (espera is not None and espera > restante):
+                    self.rechazadas += 1
+                    return False
+                turno.aviso = asyncio.get_running_loop().create_future()
+                await asyncio.wait([turno.aviso], timeout=espera if espera is not None else restante)
+        finally:
+            self.en_espera -= 1
+            self.cola.remove(turno)
+            self._avisar()
+
+    def metricas(self):
+        """Estado y contadores del limitador"""
+        with self.lock:
+            self.global_bucket.recargar(time.monotonic())
+            tokens = self.global_bucket.tokens
+        return {
+            "concedidas": self.concedidas,
+            "rechazadas": self.rechazadas,
+            "en_espera": self.en_espera,
+            "espera_promedio": self.tiempo_espera_total / self.concedidas if self.concedidas else 0.0,
+            "tokens_globales": round(tokens, 2),
+            "usuarios": len(self.usuarios),
+        }
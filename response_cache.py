@@ -0,0 +1,153 @@
+"""
+Caché de respuestas de Gemini
+Las respuestas se guardan por pregunta normalizada + huella de los documentos recuperados,
+con expiración (TTL), desalojo LRU en memoria y un nivel opcional en SQLite
+para que sobrevivan a los reinicios del bot. Las lecturas y escrituras del disco se
+hacen en un hilo aparte para no bloquear el bucle de eventos
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from retrieval import quitar_acentos
+from search_index import tokenizar
+
+# Cada cuántas escrituras se limpian las entradas vencidas del disco
+LIMPIEZA_CADA = 100
+
+
+def normalizar_pregunta(texto):
+    """Minúsculas, sin acentos, sin signos de puntuación y con espacios simples"""
+    return " ".join(tokenizar(quitar_acentos(texto)))
+
+
+def huella_contexto(pasajes):
+    """Huella de los pasajes recuperados, para no reutilizar respuestas con otro contexto"""
+    identificadores = "|".join(f"{pasaje.doc_id}:{pasaje.offset}" for pasaje, _, _ in pasajes)
+    return hashlib.sha1(identificadores.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, ttl=86400, max_entries=1000, db_path=None, max_disk_entries=50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        # clave -> (expira, respuesta), en orden de uso (el más reciente al final)
+        self.entradas = OrderedDict()
+        self.lock = threading.Lock()
+        # La base en disco tiene su propio lock: leerla no bloquea las consultas en memoria
+        self.db_lock = threading.Lock()
+        self.escrituras = 0
+        # clave -> último uso de las entradas leídas del disco, que se guarda con la próxima escritura
+        self.usados = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                "clave TEXT PRIMARY KEY, respuesta TEXT NOT NULL, expira REAL NOT NULL, usado REAL NOT NULL)"
+            )
+            self.db.commit()
+
+    @staticmethod
+    def clave(pregunta, huella=""):
+        """Clave de caché para una pregunta y el contexto recuperado"""
+        return hashlib.sha1(f"{normalizar_pregunta(pregunta)}|{huella}".encode("utf-8")).hexdigest()
+
+    async def get(self, clave):
+        """Devolver la respuesta guardada o None si no existe o venció"""
+        ahora = time.time()
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is not None:
+                if entrada[0] > ahora:
+                    self.entradas.move_to_end(clave)
+                    self.hits += 1
+                    return entrada[1]
+                del self.entradas[clave]
+
+        fila = await asyncio.to_thread(self._leer_disco, clave) if self.db is not None else None
+        with self.lock:
+            if fila is not None and fila[1] > ahora:
+                self._guardar_en_memoria(clave, fila[0], fila[1])
+                self.usados[clave] = ahora
+                self.disk_hits += 1
+                return fila[0]
+            self.misses += 1
+            return None
+
+    async def set(self, clave, respuesta):
+        """Guardar una respuesta"""
+        ahora = time.time()
+        expira = ahora + self.ttl
+        with self.lock:
+            self._guardar_en_memoria(clave, respuesta, expira)
+            usados, self.usados = self.usados, {}
+
+        if self.db is not None:
+            await asyncio.to_thread(self._escribir_disco, clave, respuesta, expira, ahora, usados)
+
+    def _leer_disco(self, clave):
+        with self.db_lock:
+            return self.db.execute(
+                "SELECT respuesta, expira FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+
+    def _escribir_disco(self, clave, respuesta, expira, ahora, usados):
+        with self.db_lock:
+            self.db.executemany(
+                "UPDATE respuestas SET usado = ? WHERE clave = ?",
+                [(usado, clave_usada) for clave_usada, usado in usados.items()]
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, respuesta, expira, usado) VALUES (?, ?, ?, ?)",
+                (clave, respuesta, expira, ahora)
+            )
+            self.escrituras += 1
+            if self.escrituras % LIMPIEZA_CADA == 0:
+                self._limpiar_disco(ahora)
+            self.db.commit()
+
+    def _guardar_en_memoria(self, clave, respuesta, expira):
+        self.entradas[clave] = (expira, respuesta)
+        self.entradas.move_to_end(clave)
+        while len(self.entradas) > self.max_entries:
+            self.entradas.popitem(last=False)
+
+    def _limpiar_disco(self, ahora):
+        """Eliminar entradas vencidas y las menos usadas si se supera el máximo"""
+        self.db.execute("DELETE FROM respuestas WHERE expira <= ?", (ahora,))
+        self.db.execute(
+            "DELETE FROM respuestas WHERE clave IN ("
+            "SELECT clave FROM respuestas ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def stats(self):
+        """Contadores de aciertos y fallos"""
+        consultas = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "tasa_aciertos": (self.hits + self.disk_hits) / consultas if consultas else 0.0,
+            "entradas": len(self.entradas),
+        }
+
+    def close(self):
+        """Cerrar la base de datos en disco"""
+        if self.db is not None:
+            with self.db_lock:
+                self.db.close()
+                self.db = None
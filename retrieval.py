@@ -0,0 +1,207 @@
+"""
+Motor de búsqueda con ranking BM25 sobre documentos y resoluciones JCE
+Indexa cada documento completo y cada uno de sus artículos, con normalización
+de acentos, palabras vacías en español y un stemming ligero
+"""
+
+import math
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+
+from search_index import InvertedIndex, tokenizar
+
+# Palabras vacías en español (ya sin acentos)
+STOPWORDS_ES = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun aunque cada como con
+contra cual cuales cuando de del desde donde dos el ella ellas ello ellos en entre era
+eran es esa esas ese eso esos esta estas este esto estos fue fueron ha han hasta hay la
+las le les lo los mas me mi mis mucho muy nada ni no nos o os otra otras otro otros para
+pero poco por porque que quien quienes se sea segun ser si sido sin sobre solo son su
+sus tambien tan te ti tiene tienen todo todos tu tus un una uno unos usted ustedes y ya yo
+""".split())
+
+Resultado = namedtuple("Resultado", ["fuente", "doc_id", "articulo", "puntaje"])
+
+
+def quitar_acentos(texto):
+    """Eliminar tildes y diéresis (á -> a, ñ -> n)"""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def stem(palabra):
+    """Stemming ligero: quitar plural y vocal final para agrupar variantes"""
+    if len(palabra) > 4 and palabra.endswith("es"):
+        palabra = palabra[:-2]
+    elif len(palabra) > 3 and palabra.endswith("s"):
+        palabra = palabra[:-1]
+
+    if len(palabra) > 4 and palabra[-1] in "aeo":
+        palabra = palabra[:-1]
+
+    return palabra
+
+
+def analizar(texto):
+    """Convertir un texto en los términos que se indexan y se buscan"""
+    return [
+        stem(palabra)
+        for palabra in tokenizar(quitar_acentos(texto))
+        if len(palabra) > 1 and palabra not in STOPWORDS_ES
+    ]
+
+
+class BM25Retriever:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.index = InvertedIndex(analizar)
+        # unidad -> (fuente, doc_id, artículo)
+        self.unidades = {}
+        # unidades en orden de inserción; su posición es la fila en los vectores de puntajes
+        self.orden = []
+        # término -> (posiciones de las unidades, puntaje BM25 precalculado de cada una)
+        self.impactos = {}
+        # fuente -> máscara booleana de las unidades de esa fuente
+        self.mascaras = {}
+
+    def __len__(self):
+        return len(self.unidades)
+
+    def agregar(self, unidad, texto, fuente, doc_id, articulo=None):
+        """Agregar una unidad (documento completo o artículo) al índice"""
+        if unidad not in self.unidades:
+            self.orden.append(unidad)
+        self.unidades[unidad] = (fuente, doc_id, articulo)
+        self.index.add_document(unidad, texto)
+
+    def finalizar(self):
+        """Precalcular el aporte BM25 de cada término en cada unidad"""
+        total = len(self.index.longitudes)
+        if not total:
+            self.impactos = {}
+            return
+
+        promedio = sum(self.index.longitudes.values()) / total
+        longitudes = self.index.longitudes
+        k1, b = self.k1, self.b
+
+        posiciones = self.index.posiciones
+        impactos = {}
+        for termino, documentos in self.index.postings.items():
+            df = len(documentos)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            impactos[termino] = (
+                np.fromiter((posiciones[unidad] for unidad in documentos), dtype=np.int32, count=df),
+                np.fromiter(
+                    (idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * longitudes[unidad] / promedio))
+                     for unidad, tf in documentos.items()),
+                    dtype=np.float32, count=df
+                )
+            )
+        self.impactos = impactos
+        self.calcular_mascaras()
+
+    def calcular_mascaras(self):
+        """Precalcular qué unidades pertenecen a cada fuente"""
+        fuentes = [self.unidades[unidad][0] for unidad in self.orden]
+        self.mascaras = {
+            fuente: np.array([f == fuente for f in fuentes], dtype=bool)
+            for fuente in set(fuentes)
+        }
+
+    def frecuencias(self):
+        """Cantidad de unidades en las que aparece cada término"""
+        return {termino: len(unidades) for termino, (unidades, _) in self.impactos.items()}
+
+    def exportar(self):
+        """Vocabulario y vectores concatenados del índice, para guardarlo en disco"""
+        terminos = {}
+        posiciones, puntajes = [np.zeros(0, dtype=np.int32)], [np.zeros(0, dtype=np.float32)]
+        inicio = 0
+        for termino, (unidades, impacto) in self.impactos.items():
+            terminos[termino] = [inicio, len(unidades)]
+            posiciones.append(unidades)
+            puntajes.append(impacto)
+            inicio += len(unidades)
+        return terminos, np.concatenate(posiciones), np.concatenate(puntajes)
+
+    @classmethod
+    def from_exported(cls, unidades, terminos, posiciones, puntajes):
+        """Reconstruir un índice exportado; unidades es una lista de (unidad, fuente, doc_id, artículo)
+
+        Los vectores de cada término son vistas sobre `posiciones` y `puntajes`, que pueden
+        venir de un archivo mapeado en memoria
+        """
+        retriever = cls()
+        for unidad, fuente, doc_id, articulo in unidades:
+            retriever.orden.append(unidad)
+            retriever.unidades[unidad] = (fuente, doc_id, articulo)
+        retriever.impactos = {
+            termino: (posiciones[inicio:inicio + cantidad], puntajes[inicio:inicio + cantidad])
+            for termino, (inicio, cantidad) in terminos.items()
+        }
+        retriever.calcular_mascaras()
+        return retriever
+
+    def buscar(self, consulta, k=5, fuente=None):
+        """Devolver las k unidades más relevantes para la consulta"""
+        puntajes = np.zeros(len(self.orden), dtype=np.float32)
+        for termino in set(analizar(consulta)):
+            impacto = self.impactos.get(termino)
+            if impacto is not None:
+                puntajes[impacto[0]] += impacto[1]
+
+        if fuente is not None:
+            if fuente not in self.mascaras:
+                return []
+            puntajes[~self.mascaras[fuente]] = 0
+
+        candidatos = np.flatnonzero(puntajes)
+        if len(candidatos) > k:
+            candidatos = candidatos[np.argpartition(-puntajes[candidatos], k)[:k]]
+
+        # Ordenar por puntaje descendente y, en empate, por orden de inserción
+        candidatos = candidatos[np.lexsort((candidatos, -puntajes[candidatos]))]
+        return [
+            Resultado(*self.unidades[self.orden[posicion]], float(puntajes[posicion]))
+            for posicion in candidatos
+        ]
+
+
+def build_retriever(documentos, resoluciones):
+    """Construir el índice BM25 a partir de los documentos y resoluciones JCE"""
+    retriever = BM25Retriever()
+
+    for filename, document in documentos.items():
+        info = document.get("informacion", {})
+        texto = " ".join([
+            info.get("titulo", filename),
+            " ".join(info.get("palabras_clave", [])),
+            document.get("contenido", "")
+        ])
+        retriever.agregar(("documento", filename, None), texto, "documento", filename)
+
+        for posicion, article in enumerate(info.get("articulos", [])):
+            retriever.agregar(
+                ("documento", filename, posicion),
+                f"Artículo {article['numero']} {article['contenido']}",
+                "documento", filename, article
+            )
+
+    for title, resolution in resoluciones.items():
+        processed = resolution.get("contenido_procesado", {})
+        texto = f"{title} {resolution.get('contenido', '')}"
+        retriever.agregar(("resolucion", title, None), texto, "resolucion", title)
+
+        for posicion, article in enumerate(processed.get("articulos", [])):
+            retriever.agregar(
+                ("resolucion", title, posicion),
+                f"Artículo {article['numero']} {article['contenido']}",
+                "resolucion", title, article
+            )
+
+    retriever.finalizar()
+    return retriever
@@ -0,0 +1,61 @@
+"""
+Índice invertido para las búsquedas del bot
+Se construye una sola vez al inicio a partir de los documentos y resoluciones JCE,
+así cada consulta cuesta lo que sus términos y no lo que el tamaño del corpus
+"""
+
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenizar(texto):
+    """Dividir un texto en palabras en minúsculas"""
+    return TOKEN_PATTERN.findall(texto.lower())
+
+
+class InvertedIndex:
+    def __init__(self, analizador=tokenizar):
+        self.analizador = analizador
+        # término -> {doc_id: frecuencia}
+        self.postings = {}
+        # doc_id -> posición de inserción (para respetar el orden original)
+        self.posiciones = {}
+        # doc_id -> cantidad de términos
+        self.longitudes = {}
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def add_document(self, doc_id, texto):
+        """Agregar un documento al índice"""
+        if doc_id not in self.posiciones:
+            self.posiciones[doc_id] = len(self.posiciones)
+
+        terminos = self.analizador(texto)
+        self.longitudes[doc_id] = self.longitudes.get(doc_id, 0) + len(terminos)
+
+        for termino in terminos:
+            documentos = self.postings.setdefault(termino, {})
+            documentos[doc_id] = documentos.get(doc_id, 0) + 1
+
+    def coincidencias(self, terminos):
+        """Conjunto de documentos que contienen alguno de los términos"""
+        encontrados = set()
+        for termino in set(terminos):
+            documentos = self.postings.get(termino)
+            if documentos:
+                encontrados.update(documentos)
+        return encontrados
+
+    def buscar(self, terminos):
+        """Devolver los documentos que contienen alguno de los términos, en orden de inserción"""
+        return sorted(self.coincidencias(terminos), key=self.posiciones.__getitem__)
+
+
+def build_index(documentos, campo="contenido", analizador=tokenizar):
+    """Construir un índice a partir de un diccionario {doc_id: documento}"""
+    index = InvertedIndex(analizador)
+    for doc_id, documento in documentos.items():
+        index.add_document(doc_id, documento.get(campo, ""))
+    return index
@@ -0,0 +1,151 @@
+"""
+Caché de respuestas por similitud para preguntas parafraseadas
+Cada pregunta se reduce a su conjunto de términos normalizados (sin palabras vacías
+ni fórmulas como "necesito" o "requisitos", pero con las que cambian su sentido, como
+"no" o "sin") y se reutiliza la respuesta de una pregunta anterior cuya similitud de
+Jaccard supere el umbral.
+Los candidatos se obtienen con filtrado por prefijo, así cada búsqueda solo revisa
+las entradas que comparten algún término poco frecuente con la consulta
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from retrieval import analizar, quitar_acentos
+from search_index import tokenizar
+
+# Fórmulas de consulta que no cambian lo que se pregunta
+FORMULAS_DE_CONSULTA = frozenset(analizar(
+    "necesito necesita necesitan quiero quisiera queria sacar saco obtener obtengo "
+    "requisitos requisito requiere requieren tramitar tramito tramite hacer hago "
+    "puedo puede debo debe saber informacion ayuda ayudar hola favor gracias buenas "
+    "buenos dias tardes noches pregunta consulta dime decir explicar"
+))
+
+
+# Palabras vacías que cambian lo que se pregunta: "con" o "sin apostilla", "si tengo" o "si no tengo"
+POLARIDAD = frozenset({"no", "ni", "sin", "con", "si", "solo", "mi"})
+# Palabras que niegan lo que se pregunta
+NEGACIONES = frozenset({"no", "ni", "sin", "nunca", "tampoco", "jamas"})
+
+
+def terminos_pregunta(texto):
+    """Conjunto de términos que identifican lo que se pregunta"""
+    terminos = {termino for termino in analizar(texto) if termino not in FORMULAS_DE_CONSULTA}
+    terminos.update(palabra for palabra in tokenizar(quitar_acentos(texto)) if palabra in POLARIDAD)
+    return frozenset(terminos)
+
+
+def negaciones(texto):
+    """Palabras de negación de un texto"""
+    return frozenset(palabra for palabra in tokenizar(quitar_acentos(texto)) if palabra in NEGACIONES)
+
+
+def jaccard(a, b):
+    """Similitud de Jaccard entre dos conjuntos"""
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+class SemanticCache:
+    def __init__(self, umbral=0.75, ttl=86400, max_entries=100000, frecuencias=None):
+        self.umbral = umbral
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Frecuencia de cada término en el corpus: los prefijos usan primero los más raros
+        self.frecuencias = frecuencias or {}
+        # terminos -> (expira, respuesta), en orden de uso (el más reciente al final)
+        self.entradas = OrderedDict()
+        # término de prefijo -> conjuntos de términos indexados con él
+        self.prefijos = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def ordenar(self, terminos):
+        """Orden global de los términos: primero los menos frecuentes"""
+        return sorted(terminos, key=lambda termino: (self.frecuencias.get(termino, 0), termino))
+
+    def prefijo(self, terminos):
+        """Términos de prefijo: dos conjuntos con Jaccard >= umbral comparten al menos uno"""
+        largo = len(terminos) - math.ceil(self.umbral * len(terminos)) + 1
+        return self.ordenar(terminos)[:largo]
+
+    def get(self, texto):
+        """Devolver la respuesta de una pregunta equivalente o None"""
+        terminos = terminos_pregunta(texto)
+        if not terminos:
+            return None
+
+        ahora = time.time()
+        with self.lock:
+            mejor, mejor_similitud = None, 0.0
+            if terminos in self.entradas:
+                mejor, mejor_similitud = terminos, 1.0
+            else:
+                minimo, maximo = self.umbral * len(terminos), len(terminos) / self.umbral
+                # Solo se reutilizan respuestas de preguntas con las mismas palabras de polaridad
+                polaridad = terminos & POLARIDAD
+                revisados = set()
+                for termino in self.prefijo(terminos):
+                    for candidato in self.prefijos.get(termino, ()):
+                        if candidato in revisados or not minimo <= len(candidato) <= maximo:
+                            continue
+                        revisados.add(candidato)
+                        if candidato & POLARIDAD != polaridad:
+                            continue
+                        similitud = jaccard(terminos, candidato)
+                        if similitud >= self.umbral and similitud > mejor_similitud:
+                            mejor, mejor_similitud = candidato, similitud
+
+            if mejor is not None:
+                expira, respuesta = self.entradas[mejor]
+                if expira > ahora:
+                    self.entradas.move_to_end(mejor)
+                    self.hits += 1
+                    return respuesta
+                self._eliminar(mejor)
+
+            self.misses += 1
+            return None
+
+    def set(self, texto, respuesta):
+        """Guardar la respuesta de una pregunta"""
+        terminos = terminos_pregunta(texto)
+        if not terminos:
+            return
+
+        with self.lock:
+            if terminos not in self.entradas:
+                for termino in self.prefijo(terminos):
+                    self.prefijos.setdefault(termino, set()).add(terminos)
+            self.entradas[terminos] = (time.time() + self.ttl, respuesta)
+            self.entradas.move_to_end(terminos)
+
+            while len(self.entradas) > self.max_entries:
+                self._eliminar(next(iter(self.entradas)))
+
+    def _eliminar(self, terminos):
+        del self.entradas[terminos]
+        for termino in self.prefijo(terminos):
+            candidatos = self.prefijos.get(termino)
+            if candidatos is not None:
+                candidatos.discard(terminos)
+                if not candidatos:
+                    del self.prefijos[termino]
+
+    def stats(self):
+        """Contadores de aciertos y fallos"""
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tasa_aciertos": self.hits / consultas if consultas else 0.0,
+            "entradas": len(self.entradas),
+        }
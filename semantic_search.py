@@ -0,0 +1,217 @@
+"""
+Búsqueda semántica local (solo CPU) sobre los pasajes JCE
+Los pasajes se convierten en vectores una sola vez durante la ingesta y se guardan
+en una matriz NumPy que el bot abre mapeada en memoria; cada consulta es un
+producto punto vectorizado contra esa matriz. Los cargadores los regeneran al final
+de cada ingesta, y si el bot los tiene que calcular al iniciar los guarda
+"""
+
+import json
+import os
+import zlib
+
+import numpy as np
+
+from passages import PASSAGES_FILE, PASSAGES_INDEX_FILE, PassageStore, build_passage_store
+from retrieval import analizar
+
+EMBEDDINGS_FILE = "jce_embeddings.npy"
+EMBEDDINGS_META_FILE = "jce_embeddings.json"
+
+# Dimensión de los vectores del embedder por hashing
+DIMENSION = 384
+
+# Constante del fusionado por ranking recíproco (modo híbrido)
+RRF_K = 60
+
+
+class HashingEmbedder:
+    """Embedder sin modelo: palabras y n-gramas de caracteres proyectados por hashing"""
+
+    def __init__(self, dimension=DIMENSION, ngrama=4, analizador=analizar):
+        self.dimension = dimension
+        self.ngrama = ngrama
+        self.analizador = analizador
+        self.nombre = f"hashing-{dimension}-{ngrama}"
+
+    def caracteristicas(self, texto):
+        """Términos normalizados y n-gramas de caracteres de cada término"""
+        for termino in self.analizador(texto):
+            yield termino
+            marcado = f"<{termino}>"
+            for inicio in range(max(1, len(marcado) - self.ngrama + 1)):
+                yield marcado[inicio:inicio + self.ngrama]
+
+    def embed_one(self, texto):
+        """Vector normalizado (norma 1) de un texto"""
+        hashes = np.fromiter(
+            (zlib.crc32(caracteristica.encode("utf-8")) for caracteristica in self.caracteristicas(texto)),
+            dtype=np.uint32
+        )
+        # El bit alto del hash decide el signo para que las colisiones tiendan a cancelarse
+        signos = np.where(hashes & 0x80000000, 1.0, -1.0)
+        vector = np.bincount(hashes % self.dimension, weights=signos, minlength=self.dimension).astype(np.float32)
+
+        # Atenuar características repetidas y normalizar
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norma = np.linalg.norm(vector)
+        return vector / norma if norma else vector
+
+    def embed(self, textos):
+        """Matriz de vectores, una fila por texto"""
+        matriz = np.zeros((len(textos), self.dimension), dtype=np.float32)
+        for fila, texto in enumerate(textos):
+            matriz[fila] = self.embed_one(texto)
+        return matriz
+
+
+class SentenceTransformerEmbedder:
+    """Embedder con un modelo pequeño de sentence-transformers (opcional)"""
+
+    def __init__(self, modelo):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(modelo, device="cpu")
+        self.nombre = modelo
+
+    def embed_one(self, texto):
+        return self.embed([texto])[0]
+
+    def embed(self, textos):
+        return self.model.encode(textos, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def create_embedder():
+    """Usar el modelo indicado en EMBEDDING_MODEL o, si no hay, el embedder por hashing"""
+    modelo = os.getenv("EMBEDDING_MODEL")
+    if modelo:
+        try:
+            return SentenceTransformerEmbedder(modelo)
+        except ImportError:
+            print("⚠️ sentence-transformers no está instalado, usando embeddings por hashing")
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el modelo {modelo}: {e}")
+    return HashingEmbedder()
+
+
+def huella_pasajes(store):
+    """Identificar un almacén de pasajes para detectar embeddings desactualizados"""
+    return [len(store.pasajes), sum(pasaje.longitud for pasaje in store.pasajes)]
+
+
+class SemanticIndex:
+    def __init__(self, matriz, embedder):
+        self.matriz = matriz
+        self.embedder = embedder
+
+    def __len__(self):
+        return self.matriz.shape[0]
+
+    def buscar(self, consulta, k=4):
+        """Devolver las k posiciones más similares como (posición, similitud)"""
+        if not len(self):
+            return []
+
+        similitudes = self.matriz @ self.embedder.embed_one(consulta)
+        k = min(k, len(similitudes))
+        mejores = np.argpartition(-similitudes, k - 1)[:k]
+        mejores = mejores[np.argsort(-similitudes[mejores], kind="stable")]
+        return [(int(posicion), float(similitudes[posicion])) for posicion in mejores if similitudes[posicion] > 0]
+
+    @classmethod
+    def build(cls, store, embedder=None):
+        """Calcular los vectores de todos los pasajes"""
+        embedder = embedder or create_embedder()
+        textos = [f"{pasaje.titulo} {store.texto(pasaje)}" for pasaje in store.pasajes]
+        return cls(embedder.embed(textos), embedder)
+
+    def save(self, store, embeddings_file=EMBEDDINGS_FILE, meta_file=EMBEDDINGS_META_FILE):
+        """Guardar la matriz en formato .npy junto con sus metadatos"""
+        # Se escribe aparte y se renombra: un bot en ejecución puede tener la matriz anterior
+        # mapeada en memoria y no se puede truncar debajo de él
+        temporal = f"{embeddings_file}.{os.getpid()}.tmp"
+        with open(temporal, 'wb') as f:
+            np.save(f, self.matriz)
+        os.replace(temporal, embeddings_file)
+        temporal = f"{meta_file}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({
+                "modelo": self.embedder.nombre,
+                "dimension": int(self.matriz.shape[1]),
+                "pasajes": huella_pasajes(store)
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, meta_file)
+        print(f"✅ {len(self)} vectores guardados en {embeddings_file}")
+
+    @classmethod
+    def load(cls, store, embedder=None, embeddings_file=EMBEDDINGS_FILE, meta_file=EMBEDDINGS_META_FILE):
+        """Abrir la matriz mapeada en memoria; None si falta o no corresponde a los pasajes"""
+        embedder = embedder or create_embedder()
+        if not (os.path.exists(embeddings_file) and os.path.exists(meta_file)):
+            return None
+
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("modelo") != embedder.nombre or meta.get("pasajes") != huella_pasajes(store):
+            print("⚠️ Los embeddings guardados no corresponden a los pasajes actuales")
+            return None
+
+        return cls(np.load(embeddings_file, mmap_mode='r'), embedder)
+
+
+def load_semantic_index(store):
+    """Abrir los embeddings guardados o, si no existen o están desactualizados, calcularlos y guardarlos"""
+    try:
+        index = SemanticIndex.load(store)
+        if index is not None:
+            return index
+    except Exception as e:
+        print(f"Error cargando embeddings: {e}")
+    index = SemanticIndex.build(store)
+    try:
+        index.save(store)
+    except OSError as e:
+        print(f"⚠️ No se pudieron guardar los embeddings: {e}")
+    return index
+
+
+def actualizar_embeddings(store):
+    """Regenerar los embeddings guardados después de una ingesta (si se usa la búsqueda semántica)"""
+    if os.path.exists(EMBEDDINGS_META_FILE):
+        SemanticIndex.build(store).save(store)
+
+
+def fusionar(rankings, k=4):
+    """Combinar varios rankings de posiciones con fusionado por ranking recíproco"""
+    puntajes = {}
+    for ranking in rankings:
+        for lugar, (posicion, _) in enumerate(ranking):
+            puntajes[posicion] = puntajes.get(posicion, 0.0) + 1.0 / (RRF_K + lugar + 1)
+    return sorted(puntajes.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def buscar_hibrido(store, index, consulta, k=4):
+    """Combinar los pasajes de BM25 y de la búsqueda semántica en un solo ranking"""
+    if store.retriever is None:
+        store.indexar()
+    lexicos = [(resultado.doc_id, resultado.puntaje) for resultado in store.retriever.buscar(consulta, k=k)]
+    semanticos = index.buscar(consulta, k=k)
+    return [store.resultado(posicion, puntaje) for posicion, puntaje in fusionar([lexicos, semanticos], k)]
+
+
+def main():
+    """Función principal"""
+    print("🧭 Generador de Embeddings JCE")
+    print("=" * 40)
+
+    if os.path.exists(PASSAGES_FILE) and os.path.exists(PASSAGES_INDEX_FILE):
+        store = PassageStore.load()
+    else:
+        store = build_passage_store()
+
+    index = SemanticIndex.build(store)
+    index.save(store)
+    print(f"\n🎉 Modelo: {index.embedder.nombre}, dimensión {index.matriz.shape[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Respuestas progresivas en Telegram
+Se envía un mensaje provisional y se va editando con el texto que llega del modelo,
+con un intervalo mínimo entre ediciones para respetar los límites de Telegram.
+Los envíos y ediciones se hacen en una tarea aparte, así no ocupan el turno ni el
+tiempo límite de la llamada al modelo, y si una edición falla la respuesta se envía
+como mensaje nuevo
+"""
+
+import asyncio
+import time
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+# Largo máximo de un mensaje de Telegram
+MAX_LARGO_MENSAJE = 4096
+
+PLACEHOLDER = "✍️ Consultando..."
+CURSOR = " ▌"
+
+
+class StreamingReply:
+    def __init__(self, message, intervalo=1.5, placeholder=PLACEHOLDER):
+        self.message = message
+        self.intervalo = intervalo
+        self.placeholder = placeholder
+        # Mensaje enviado por el bot que se va editando (None hasta enviarlo o si ya no se puede editar)
+        self.enviado = None
+        self.mostrado = ""
+        self.pendiente = ""
+        self.proxima_edicion = 0.0
+        # Tarea que envía y edita el mensaje provisional
+        self.tarea = None
+        self.cambio = asyncio.Event()
+        self.fin = asyncio.Event()
+
+    def iniciar(self):
+        """Empezar a mostrar la respuesta en segundo plano"""
+        if self.tarea is None:
+            self.tarea = asyncio.create_task(self._mostrar_progreso())
+
+    def actualizar(self, texto):
+        """Registrar el texto parcial; se muestra cuando pasa el intervalo desde la última edición"""
+        self.pendiente = texto
+        self.cambio.set()
+
+    async def finalizar(self, texto):
+        """Reemplazar el mensaje provisional por la respuesta completa"""
+        if self.tarea is not None:
+            self.fin.set()
+            self.cambio.set()
+            await self.tarea
+
+        partes = [texto[i:i + MAX_LARGO_MENSAJE] for i in range(0, len(texto), MAX_LARGO_MENSAJE)] or [self.placeholder]
+        # La edición final no se puede omitir: si no se puede editar, se envía un mensaje nuevo
+        if self.enviado is None or not await self._editar(partes[0]):
+            await self.message.reply_text(partes[0])
+        for parte in partes[1:]:
+            await self.message.reply_text(parte)
+
+    async def _mostrar_progreso(self):
+        """Enviar el mensaje provisional y editarlo con el texto parcial hasta que termine la respuesta"""
+        try:
+            self.enviado = await self.message.reply_text(self.placeholder)
+        except TelegramError as e:
+            print(f"⚠️ No se pudo enviar el mensaje provisional: {e}")
+            return
+        self.proxima_edicion = time.monotonic() + self.intervalo
+
+        while not self.fin.is_set() and self.enviado is not None:
+            espera = self.proxima_edicion - time.monotonic()
+            if espera > 0:
+                # Esperar el intervalo, salvo que la respuesta termine antes
+                try:
+                    await asyncio.wait_for(self.fin.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            texto = self.pendiente.strip()[:MAX_LARGO_MENSAJE - len(CURSOR)]
+            if texto and texto != self.mostrado:
+                if await self._editar(texto + CURSOR):
+                    self.mostrado = texto
+            else:
+                self.cambio.clear()
+                await self.cambio.wait()
+
+    async def _editar(self, texto):
+        """Editar el mensaje enviado; False si no se pudo"""
+        self.proxima_edicion = time.monotonic() + self.intervalo
+        try:
+            await self.enviado.edit_text(texto)
+        except RetryAfter as e:
+            espera = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            self.proxima_edicion = time.monotonic() + espera
+            return False
+        except BadRequest as e:
+            # Telegram rechaza ediciones que no cambian el texto
+            if "not modified" in str(e).lower():
+                return True
+            # El mensaje ya no se puede editar (por ejemplo, se eliminó): no se vuelve a intentar
+            print(f"⚠️ No se pudo editar la respuesta: {e}")
+            self.enviado = None
+            return False
+        except TelegramError as e:
+            print(f"⚠️ No se pudo editar la respuesta: {e}")
+            return False
+        return True
@@ -0,0 +1,89 @@
+"""
+Resumen progresivo de las conversaciones
+Cuando los turnos de una conversación superan un umbral de tokens, los más antiguos se
+resumen con el modelo en una tarea de fondo (fuera del camino de la respuesta) y se
+reemplazan en el historial por el resumen, que se acumula con los anteriores
+"""
+
+import asyncio
+
+from prompt_builder import linea_turno
+
+INSTRUCCION_RESUMEN = (
+    "Resume la siguiente conversación entre un gestor y el asistente de Registro Civil de "
+    "República Dominicana. Conserva los datos concretos (nombres, documentos, trámites, "
+    "fechas y números de resolución) y lo que el gestor ya preguntó o resolvió. "
+    "Responde solo con el resumen, en un párrafo breve.\n\n"
+)
+
+
+class Summarizer:
+    def __init__(self, historial, generar, umbral_tokens=1500, conservar=6):
+        self.historial = historial
+        # Corrutina que recibe el prompt y devuelve el resumen (None si no se pudo llamar al modelo)
+        self.generar = generar
+        self.umbral_tokens = umbral_tokens
+        # Máximo de turnos recientes que se dejan sin resumir
+        self.conservar = conservar
+        # user_id -> tarea en curso; a lo sumo un resumen por usuario a la vez
+        self.tareas = {}
+
+        self.resumidas = 0
+        self.fallidas = 0
+
+    def necesita_resumen(self, turnos):
+        """Indicar si los turnos (sin contar el mensaje de sistema) superan el umbral"""
+        return sum(turno.tokens for turno in turnos[1:]) > self.umbral_tokens
+
+    def recientes(self, turnos):
+        """Cuántos turnos recientes quedan sin resumir: hasta `conservar` y la mitad del umbral,
+        para que la conversación tenga que crecer bastante antes del siguiente resumen"""
+        cantidad, tokens = 0, 0
+        for turno in reversed(turnos):
+            if cantidad >= self.conservar or (cantidad >= 2 and tokens + turno.tokens > self.umbral_tokens // 2):
+                break
+            cantidad += 1
+            tokens += turno.tokens
+        return cantidad
+
+    def programar(self, user_id, turnos):
+        """Iniciar el resumen en segundo plano si la conversación lo necesita"""
+        if user_id in self.tareas or not self.necesita_resumen(turnos):
+            return
+        tarea = asyncio.create_task(self._resumir(user_id))
+        self.tareas[user_id] = tarea
+        tarea.add_done_callback(lambda _: self.tareas.pop(user_id, None))
+
+    async def _resumir(self, user_id):
+        try:
+            turnos = (await self.historial.turnos(user_id))[1:]
+            anterior = turnos[0].content if turnos and turnos[0].role == "summary" else None
+            if anterior is not None:
+                turnos = turnos[1:]
+            antiguos = turnos[:len(turnos) - self.recientes(turnos)]
+            if not antiguos:
+                return
+
+            partes = [INSTRUCCION_RESUMEN]
+            if anterior:
+                partes.append(f"Resumen previo: {anterior}\n")
+            partes.extend(linea_turno(turno) for turno in antiguos)
+            prompt = "".join(partes)
+
+            resumen = await self.generar(prompt)
+            if not resumen:
+                return
+            await self.historial.compactar(user_id, resumen.strip(), len(antiguos))
+            self.resumidas += 1
+        except Exception as e:
+            self.fallidas += 1
+            print(f"Error resumiendo la conversación: {e}")
+
+    async def close(self):
+        """Esperar los resúmenes en curso"""
+        if self.tareas:
+            await asyncio.gather(*self.tareas.values(), return_exceptions=True)
+
+    def stats(self):
+        """Contadores de resúmenes"""
+        return {"en_curso": len(self.tareas), "resumidas": self.resumidas, "fallidas": self.fallidas}
@@ -0,0 +1,102 @@
+"""
+Procesamiento concurrente de updates de Telegram
+Los mensajes de chats distintos se atienden en paralelo (hasta el máximo configurado),
+mientras que los de un mismo chat se procesan uno tras otro y en el orden de llegada.
+Un update toma su lugar entre los concurrentes recién cuando le llega el turno en su
+chat, así un chat con muchos mensajes en cola no demora a los demás.
+Los updates recibidos y no terminados también tienen un máximo: al alcanzarlo la
+aplicación deja de sacar updates de su cola hasta que se libera uno
+"""
+
+import asyncio
+import sys
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Procesador de updates concurrente que conserva el orden dentro de cada chat"""
+
+    __slots__ = ("_chats", "_limite", "_lugares", "_en_proceso", "_max_pendientes", "_pendientes")
+
+    def __init__(self, max_concurrent_updates, max_pendientes=None):
+        # BaseUpdateProcessor.process_update toma su semáforo antes de llamar a do_process_update:
+        # si limitara, los updates que esperan el turno de su chat ocuparían lugares. Se crea sin
+        # límite efectivo y el límite real se aplica después del turno del chat
+        self._limite = sys.maxsize
+        self._pendientes = 0
+        self._max_pendientes = sys.maxsize
+        super().__init__(sys.maxsize)
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates debe ser un entero positivo")
+        self._limite = max_concurrent_updates
+        self._lugares = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._en_proceso = 0
+        # Updates recibidos que esperan su turno o se están procesando
+        self._max_pendientes = max_pendientes or 4 * max_concurrent_updates
+        if self._max_pendientes < max_concurrent_updates:
+            raise ValueError("max_pendientes no puede ser menor que max_concurrent_updates")
+        # chat_id -> [candado, updates pendientes]; se elimina cuando el chat queda sin pendientes
+        self._chats = {}
+
+    @property
+    def max_concurrent_updates(self):
+        # La aplicación consulta este valor por cada update que saca de su cola: con 1 procesa
+        # el update antes de sacar el siguiente, así los updates en exceso quedan en la cola
+        # (que puede ser acotada) en lugar de crear una tarea cada uno
+        if self._pendientes >= self._max_pendientes:
+            return 1
+        return self._limite
+
+    @property
+    def pending_updates(self):
+        """Updates recibidos que esperan su turno o se están procesando"""
+        return self._pendientes
+
+    @property
+    def current_concurrent_updates(self):
+        return self._en_proceso
+
+    async def _procesar(self, coroutine):
+        """Procesar el update ocupando uno de los lugares concurrentes"""
+        async with self._lugares:
+            self._en_proceso += 1
+            try:
+                await coroutine
+            finally:
+                self._en_proceso -= 1
+
+    async def do_process_update(self, update, coroutine):
+        """Esperar el turno del chat y procesar el update"""
+        self._pendientes += 1
+        try:
+            await self._en_turno(update, coroutine)
+        finally:
+            self._pendientes -= 1
+
+    async def _en_turno(self, update, coroutine):
+        """Procesar el update cuando le toca en su chat"""
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await self._procesar(coroutine)
+            return
+
+        entrada = self._chats.get(chat.id)
+        if entrada is None:
+            entrada = self._chats[chat.id] = [asyncio.Lock(), 0]
+        entrada[1] += 1
+        try:
+            # asyncio.Lock despierta a quienes esperan en orden de llegada
+            async with entrada[0]:
+                await self._procesar(coroutine)
+        finally:
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                del self._chats[chat.id]
+
+    async def initialize(self):
+        """No requiere inicialización"""
+
+    async def shutdown(self):
+        """No requiere cierre"""
@@ -0,0 +1,96 @@
+"""
+Modo webhook del bot
+Telegram envía cada update por HTTP a un servidor aiohttp, que lo valida con el
+token secreto y lo deja en la cola de la aplicación; así no hay long polling y
+se pueden poner varias réplicas del bot detrás de un balanceador de carga
+"""
+
+import asyncio
+import json
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+# Tipos de update que atienden los handlers del bot
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+# Cabecera con la que Telegram envía el token secreto configurado en setWebhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+async def recibir_update(request):
+    """Recibir un update de Telegram y encolarlo para la aplicación"""
+    application = request.app["application"]
+    secreto = request.app["secreto"]
+    if secreto and request.headers.get(SECRET_HEADER) != secreto:
+        return web.Response(status=403)
+
+    try:
+        data = await request.json()
+        update = Update.de_json(data, application.bot)
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return web.Response(status=400)
+
+    await application.update_queue.put(update)
+    return web.Response()
+
+
+async def salud(request):
+    """Comprobación de estado para el balanceador de carga"""
+    application = request.app["application"]
+    estado = {
+        "estado": "ok" if application.running else "detenido",
+        "pendientes": application.update_queue.qsize(),
+    }
+    if request.app["metricas"] is not None:
+        estado["limitador"] = request.app["metricas"]()
+    return web.json_response(estado)
+
+
+def crear_servidor(application, path, secreto=None, metricas=None):
+    """Aplicación aiohttp con el endpoint del webhook y el de salud; `metricas()` agrega al
+    de salud el estado del limitador de llamadas"""
+    servidor = web.Application()
+    servidor["application"] = application
+    servidor["secreto"] = secreto
+    servidor["metricas"] = metricas
+    servidor.router.add_post(path, recibir_update)
+    servidor.router.add_get("/salud", salud)
+    return servidor
+
+
+async def servir_webhook(application, url, host="0.0.0.0", port=8443, path="/telegram",
+                         secreto=None, allowed_updates=ALLOWED_UPDATES, registrar=True, metricas=None):
+    """Registrar el webhook en Telegram y atender updates hasta recibir SIGINT o SIGTERM"""
+    detener = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(senal, detener.set)
+
+    async with application:
+        await application.start()
+        if registrar:
+            await application.bot.set_webhook(
+                url=url.rstrip("/") + path,
+                allowed_updates=allowed_updates,
+                secret_token=secreto,
+            )
+
+        runner = web.AppRunner(crear_servidor(application, path, secreto, metricas))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        print(f"🌐 Webhook escuchando en {host}:{port}{path}")
+        try:
+            await detener.wait()
+        finally:
+            await runner.cleanup()
+            await application.stop()
+    # run_polling llama a post_shutdown por su cuenta; en este modo hay que hacerlo aquí
+    if application.post_shutdown:
+        await application.post_shutdown(application)
+
+
+def run_webhook(application, url, **kwargs):
+    """Ejecutar el bot en modo webhook"""
+    asyncio.run(servir_webhook(application, url, **kwargs))